@@ -1,4 +1,15 @@
-from flask import Flask, request, jsonify
+import base64
+import json
+import os
+import queue
+import sqlite3
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from itertools import islice
+from operator import itemgetter
+
+from flask import Flask, Response, request, jsonify
 
 app = Flask(__name__)
 
@@ -35,16 +46,414 @@ def search_dict(dict_obj: dict, q: str):
             out.append(item)
     return out
 
+# ---------------------------
+# 검색 인덱스 (n-gram 역색인)
+# - 레코드마다 값들을 미리 str().lower()로 바꿔 두고, 1-gram/2-gram → 레코드 키 목록을 색인
+# - 검색: 키워드의 n-gram을 모두 가진 후보만 골라 실제 부분일치(kw in 값)를 확인
+#   → search_dict와 같은 결과/순서 (한글 부분검색 "이어" 등 그대로 동작)
+# - 레코드를 추가/수정/삭제하면 upsert()/remove() 호출
+# ---------------------------
+def _ngrams(text: str) -> set:
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+class SearchIndex:
+    def __init__(self, dict_obj: dict):
+        self.dict_obj = dict_obj
+        self._texts = {}     # key -> [소문자 값 문자열, ...]
+        self._grams = {}     # key -> 그 레코드의 n-gram 집합
+        self._postings = {}  # n-gram -> {key, ...}
+        self._pos = {}       # key -> 삽입 순번 (결과를 dict 순서대로 돌려주기 위함)
+        self._order = []     # (순번, key) 순번 오름차순 — 빈 키워드 목록을 커서 자리부터 바로 시작
+        self._seq = 0
+        for key, item in dict_obj.items():
+            self._add(key, item)
+
+    def _add(self, key, item: dict):
+        texts = [str(v).lower() for v in item.values()]
+        grams = set().union(*map(_ngrams, texts)) if texts else set()
+        self._texts[key] = texts
+        self._grams[key] = grams
+        for g in grams:
+            self._postings.setdefault(g, set()).add(key)
+        if key not in self._pos:
+            self._pos[key] = self._seq
+            self._order.append((self._seq, key))
+            self._seq += 1
+
+    def _drop(self, key):
+        for g in self._grams.pop(key, ()):
+            keys = self._postings.get(g)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[g]
+        self._texts.pop(key, None)
+
+    def upsert(self, key, item: dict):
+        """dict_obj[key] = item 후(또는 값 수정 후) 호출"""
+        self._drop(key)
+        self._add(key, item)
+
+    def remove(self, key):
+        """del dict_obj[key] 후 호출"""
+        self._drop(key)
+        pos = self._pos.pop(key, None)
+        if pos is not None:
+            del self._order[bisect_right(self._order, pos, key=itemgetter(0)) - 1]
+
+    def matches(self, q: str, after=None):
+        """q에 맞는 (순번, 레코드)를 dict 순서대로 내놓는 반복자. after가 있으면 그 순번 다음부터 (커서)"""
+        if not q or q.strip() == "":
+            # 빈 키워드는 전체, 공백 키워드는 contains()가 항상 참 → 값이 하나라도 있는 레코드 전부
+            return self._scan(after, keep_empty=not q)
+        kw = q.lower()
+        grams = {kw} if len(kw) == 1 else {kw[i:i + 2] for i in range(len(kw) - 1)}
+        # 가장 짧은 posting부터 교집합
+        postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+        cand = set(postings[0]).intersection(*postings[1:]) if postings else set()
+        hits = sorted((self._pos[k], k) for k in cand
+                      if (after is None or self._pos[k] > after) and any(kw in t for t in self._texts[k]))
+        return ((pos, self.dict_obj[k]) for pos, k in hits)
+
+    def _scan(self, after, keep_empty):
+        """순번 순서 전체 목록을 커서 다음 자리부터 하나씩 (페이지 크기만큼만 읽으면 멈춤)
+        자리는 매번 마지막 순번으로 다시 찾으므로 도는 중에 추가/삭제가 있어도 건너뛰거나 겹치지 않음"""
+        pos = after
+        while True:
+            i = 0 if pos is None else bisect_right(self._order, pos, key=itemgetter(0))
+            if i >= len(self._order):
+                return
+            pos, key = self._order[i]
+            item = self.dict_obj.get(key)
+            if item is not None and (keep_empty or item):
+                yield pos, item
+
+    def search(self, q: str):
+        """search_dict(self.dict_obj, q)와 같은 결과"""
+        return [item for _, item in self.matches(q)]
+
+# ---------------------------
+# 저장소 (APP_STORAGE=memory | sqlite)
+# 두 백엔드 모두 같은 메서드를 가짐: get / get_many / matches / search / put / delete
+# - MemoryStore: 위 사전형 데이터 + SearchIndex (워커마다 사본, 기본값)
+# - SQLiteStore: 파일 하나를 모든 워커가 공유 (WAL), 워커마다 크기가 정해진 연결 풀을 재사용하고
+#   SQL은 고정 문자열 + 파라미터라 연결별 prepared statement 캐시를 그대로 씀
+# ---------------------------
+class MemoryStore:
+    def __init__(self, dict_obj: dict):
+        self.dict_obj = dict_obj
+        self.index = SearchIndex(dict_obj)
+
+    def get(self, key):
+        return self.dict_obj.get(key)
+
+    def get_many(self, keys):
+        return {k: self.dict_obj[k] for k in keys if k in self.dict_obj}
+
+    def matches(self, q: str, after=None):
+        return self.index.matches(q, after=after)
+
+    def search(self, q: str):
+        return self.index.search(q)
+
+    def put(self, key, item: dict):
+        self.dict_obj[key] = item
+        self.index.upsert(key, item)
+
+    def delete(self, key):
+        if self.dict_obj.pop(key, None) is not None:
+            self.index.remove(key)
+
+class SQLiteStore:
+    """테이블 한 개 = 레코드 사전 하나
+    seq(삽입 순번, 커서/정렬) · id(UNIQUE 인덱스) · data(JSON) · search(소문자 값들, 부분검색용)
+    부분검색은 search 열의 FTS5 trigram 색인({table}_fts)으로 후보를 찾음 (3글자 미만 키워드나
+    FTS5가 없는 SQLite에서는 instr 전체 스캔)
+    """
+    SEP = "\x1f"
+
+    def __init__(self, path: str, table: str, seed=None, pool_size: int = 8, timeout: float = 5.0):
+        self.path, self.table = path, table
+        self.pool_size, self.timeout = pool_size, timeout
+        self._pool_lock = threading.Lock()
+        self._pid = None
+        t = table
+        self._sql = {
+            "get": f"SELECT data FROM {t} WHERE id = ?",
+            "get_many": f"SELECT id, data FROM {t} WHERE id IN (SELECT value FROM json_each(?))",
+            "all": f"SELECT seq, data FROM {t} WHERE seq > ? ORDER BY seq",
+            "nonempty": f"SELECT seq, data FROM {t} WHERE seq > ? AND data != '{{}}' ORDER BY seq",
+            "search": f"SELECT seq, data FROM {t} WHERE seq > ? AND instr(search, ?) > 0 ORDER BY seq",
+            "search_fts": (f"SELECT seq, data FROM {t} WHERE seq > ? AND seq IN "
+                           f"(SELECT rowid FROM {t}_fts WHERE {t}_fts MATCH ?) ORDER BY seq"),
+            "put": (f"INSERT INTO {t} (id, data, search) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET data = excluded.data, search = excluded.search"),
+            "delete": f"DELETE FROM {t} WHERE id = ?",
+        }
+        with self._conn() as conn, conn:
+            conn.execute(f"""CREATE TABLE IF NOT EXISTS {t} (
+                seq    INTEGER PRIMARY KEY AUTOINCREMENT,
+                id     INTEGER NOT NULL UNIQUE,
+                data   TEXT NOT NULL,
+                search TEXT NOT NULL
+            )""")
+            self._fts = self._create_fts(conn)
+            empty = conn.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {t})").fetchone()[0]
+        if empty and seed:
+            for key, item in seed.items():
+                self.put(key, item)
+
+    def _create_fts(self, conn) -> bool:
+        """search 열의 trigram 색인 + 동기화 트리거. FTS5/trigram을 지원하지 않으면 False"""
+        t = self.table
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f"{t}_fts",)).fetchone()
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {t}_fts USING fts5("
+                         f"search, content='{t}', content_rowid='seq', tokenize='trigram')")
+        except sqlite3.OperationalError:
+            return False
+        conn.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {t}_fts_ai AFTER INSERT ON {t} BEGIN
+                INSERT INTO {t}_fts(rowid, search) VALUES (new.seq, new.search);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {t}_fts_ad AFTER DELETE ON {t} BEGIN
+                INSERT INTO {t}_fts({t}_fts, rowid, search) VALUES ('delete', old.seq, old.search);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {t}_fts_au AFTER UPDATE ON {t} BEGIN
+                INSERT INTO {t}_fts({t}_fts, rowid, search) VALUES ('delete', old.seq, old.search);
+                INSERT INTO {t}_fts(rowid, search) VALUES (new.seq, new.search);
+            END;
+        """)
+        if not exists:
+            # 색인 없이 만들어진 기존 파일: 현재 행으로 채움
+            conn.execute(f"INSERT INTO {t}_fts({t}_fts) VALUES ('rebuild')")
+        return True
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, cached_statements=256, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        """이 워커(프로세스)의 연결 풀에서 하나 빌려 씀 (최대 pool_size개, 모두 사용 중이면 timeout초 대기)
+        fork 뒤에는 부모 연결을 쓰지 않고 새 풀을 만듦"""
+        with self._pool_lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._idle = queue.LifoQueue()
+                self._slots = threading.BoundedSemaphore(self.pool_size)
+            idle, slots = self._idle, self._slots
+        if not slots.acquire(timeout=self.timeout):
+            raise RuntimeError(f"SQLite 연결 풀({self.pool_size}개)이 모두 사용 중입니다.")
+        try:
+            try:
+                conn = idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                idle.put(conn)
+        finally:
+            slots.release()
+
+    def _rows(self, sql: str, params):
+        """조회 결과를 한 행씩 (다 읽거나 반복자를 버릴 때까지 연결을 빌려 둠)"""
+        with self._conn() as conn:
+            cur = conn.execute(sql, params)
+            try:
+                yield from cur
+            finally:
+                cur.close()
+
+    def _search_text(self, item: dict) -> str:
+        return self.SEP.join(str(v).lower() for v in item.values())
+
+    def get(self, key):
+        if not -2**63 <= key < 2**63:  # SQLite INTEGER 범위 밖이면 없는 id
+            return None
+        with self._conn() as conn:
+            row = conn.execute(self._sql["get"], (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, keys):
+        with self._conn() as conn:
+            rows = conn.execute(self._sql["get_many"], (json.dumps(list(keys)),)).fetchall()
+        return {k: json.loads(data) for k, data in rows}
+
+    def matches(self, q: str, after=None):
+        after = -1 if after is None else after
+        if not q:
+            rows = self._rows(self._sql["all"], (after,))
+        elif q.strip() == "":
+            rows = self._rows(self._sql["nonempty"], (after,))
+        else:
+            kw = q.lower()
+            if self._fts and len(kw) >= 3:
+                # trigram 색인: 키워드 전체를 한 구(phrase)로 → 연속 부분일치 후보
+                rows = self._rows(self._sql["search_fts"], (after, '"' + kw.replace('"', '""') + '"'))
+            else:
+                rows = self._rows(self._sql["search"], (after, kw))
+            # search 열은 값들을 구분자로 이어 붙인 것이라, 값 경계를 걸친 일치는 한 번 더 걸러냄
+            return ((seq, item) for seq, item in ((seq, json.loads(d)) for seq, d in rows)
+                    if any(kw in str(v).lower() for v in item.values()))
+        return ((seq, json.loads(d)) for seq, d in rows)
+
+    def search(self, q: str):
+        return [item for _, item in self.matches(q)]
+
+    def put(self, key, item: dict):
+        with self._conn() as conn, conn:
+            conn.execute(self._sql["put"], (key, json.dumps(item, ensure_ascii=False), self._search_text(item)))
+
+    def delete(self, key):
+        with self._conn() as conn, conn:
+            conn.execute(self._sql["delete"], (key,))
+
+def make_store(name: str, seed: dict):
+    backend = os.environ.get("APP_STORAGE", "memory")
+    if backend == "memory":
+        return MemoryStore(seed)
+    if backend == "sqlite":
+        return SQLiteStore(os.environ.get("APP_SQLITE_PATH", "app_data.sqlite3"), name, seed=seed,
+                           pool_size=int(os.environ.get("APP_SQLITE_POOL", "8")))
+    raise RuntimeError(f"알 수 없는 APP_STORAGE: {backend} (memory 또는 sqlite)")
+
+customer_store = make_store("customers", customers)
+product_store = make_store("products", products)
+
+# ---------------------------
+# 목록 응답: 페이지(limit/cursor), 필드 선택(fields), NDJSON 스트리밍(format=ndjson)
+# - 아무 옵션도 없으면 예전처럼 전체 목록 JSON 배열
+# - limit/cursor: {"items": [...], "next_cursor": "..." 또는 null}
+#   cursor는 마지막 레코드의 삽입 순번이라, 페이지 사이에 레코드가 추가/삭제돼도 중복/누락 없음
+# - format=ndjson: 한 줄에 레코드 하나씩 흘려보냄 (limit이 있으면 다음 커서는 X-Next-Cursor 헤더)
+# ---------------------------
+MAX_LIMIT = 1000
+
+def _encode_cursor(pos: int) -> str:
+    return base64.urlsafe_b64encode(str(pos).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("cursor가 올바르지 않습니다.")
+
+def _list_options(args):
+    """(limit, after, fields, fmt) — 잘못된 값이면 ValueError"""
+    limit = args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ValueError(f"limit은 1~{MAX_LIMIT} 사이 정수여야 합니다.")
+    cursor = args.get("cursor")
+    after = _decode_cursor(cursor) if cursor else None
+    fields = args.get("fields")
+    fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    fmt = args.get("format", "json")
+    if fmt not in ("json", "ndjson"):
+        raise ValueError("format은 json 또는 ndjson만 가능합니다.")
+    return limit, after, fields, fmt
+
+def _project(item: dict, fields):
+    return item if fields is None else {f: item[f] for f in fields if f in item}
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield app.json.dumps(row) + "\n"
+
+def list_response(store, q: str):
+    try:
+        limit, after, fields, fmt = _list_options(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = store.matches(q, after=after)
+    next_cursor = None
+    if limit is not None:
+        # 한 개 더 읽어서 다음 페이지가 있는지 확인
+        page = list(islice(rows, limit + 1))
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = _encode_cursor(page[-1][0])
+        rows = iter(page)
+    items = (_project(item, fields) for _, item in rows)
+
+    if fmt == "ndjson":
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return Response(_ndjson_lines(items), mimetype="application/x-ndjson", headers=headers)
+    if limit is None and after is None:
+        return jsonify(list(items))
+    return jsonify({"items": list(items), "next_cursor": next_cursor})
+
+# ---------------------------
+# 여러 id 한 번에 조회 (POST /customers:batchGet, /products:batchGet)
+# - 요청: {"ids": [1, 2, "3", ...], "fields": ["id", "name"](선택)}
+# - 응답: {"found": [요청 순서대로 레코드], "missing": [없거나 정수가 아닌 id]}
+# ---------------------------
+MAX_BATCH_IDS = 1000
+
+def batch_response(store):
+    body = request.get_json(silent=True)
+    ids = body.get("ids") if isinstance(body, dict) else None
+    if not isinstance(ids, list):
+        return jsonify({"error": '{"ids": [...]} 형식의 JSON 본문이 필요합니다.'}), 400
+    if len(ids) > MAX_BATCH_IDS:
+        return jsonify({"error": f"ids는 최대 {MAX_BATCH_IDS}개까지 가능합니다."}), 400
+    fields = body.get("fields")
+    if fields is not None and not (isinstance(fields, list) and all(isinstance(f, str) for f in fields)):
+        return jsonify({"error": "fields는 문자열 목록이어야 합니다."}), 400
+
+    parsed = []
+    for raw in ids:
+        # ?id=와 같은 규칙: 정수 또는 정수 문자열만 (bool/실수는 id로 보지 않음)
+        try:
+            if isinstance(raw, bool) or not isinstance(raw, (int, str)):
+                raise ValueError(raw)
+            parsed.append((raw, int(raw)))
+        except ValueError:
+            parsed.append((raw, None))
+    records = store.get_many({key for _, key in parsed if key is not None})  # 저장소 조회는 배치당 한 번
+
+    found, missing, seen = [], [], set()
+    for raw, key in parsed:
+        if key is None:
+            missing.append(raw)
+            continue
+        if key in seen:  # 같은 id는 한 번만
+            continue
+        seen.add(key)
+        if key in records:
+            found.append(_project(records[key], fields))
+        else:
+            missing.append(raw)
+    return jsonify({"found": found, "missing": missing})
+
 # ---------------------------
 # 라우트
 # ---------------------------
 
 @app.get("/")
 def all_data():
-    """모든 고객/상품 정보 한 번에 조회"""
+    """모든 고객/상품 정보 한 번에 조회
+    - /?format=ndjson: {"table": "customers"|"products", "item": {...}} 한 줄씩 스트리밍
+    """
+    if request.args.get("format") == "ndjson":
+        rows = ({"table": name, "item": item}
+                for name, store in (("customers", customer_store), ("products", product_store))
+                for _, item in store.matches(""))
+        return Response(_ndjson_lines(rows), mimetype="application/x-ndjson")
     return jsonify({
-        "customers": list(customers.values()),
-        "products": list(products.values()),
+        "customers": customer_store.search(""),
+        "products": product_store.search(""),
     })
 
 @app.get("/customers")
@@ -54,6 +463,7 @@ def customers_route():
     - 전체: /customers
     - 키워드: /customers?q=키워드
     - (선택) 단건: /customers?id=1
+    - 페이지/필드/스트리밍: /customers?q=경기&limit=50&cursor=...&fields=id,name&format=ndjson
     """
     q = request.args.get("q", "").strip()
     id_str = request.args.get("id")
@@ -61,11 +471,12 @@ def customers_route():
     if id_str:
         try:
             cid = int(id_str)
-            return jsonify([customers[cid]]) if cid in customers else jsonify([])
+            item = customer_store.get(cid)
+            return jsonify([item]) if item is not None else jsonify([])
         except ValueError:
             return jsonify([])
 
-    return jsonify(search_dict(customers, q))
+    return list_response(customer_store, q)
 
 @app.get("/products")
 def products_route():
@@ -74,6 +485,7 @@ def products_route():
     - 전체: /products
     - 키워드: /products?q=키워드
     - (선택) 단건: /products?id=101
+    - 페이지/필드/스트리밍: /products?limit=50&cursor=...&fields=id,name,price&format=ndjson
     """
     q = request.args.get("q", "").strip()
     id_str = request.args.get("id")
@@ -81,11 +493,22 @@ def products_route():
     if id_str:
         try:
             pid = int(id_str)
-            return jsonify([products[pid]]) if pid in products else jsonify([])
+            item = product_store.get(pid)
+            return jsonify([item]) if item is not None else jsonify([])
         except ValueError:
             return jsonify([])
 
-    return jsonify(search_dict(products, q))
+    return list_response(product_store, q)
+
+@app.post("/customers:batchGet")
+def customers_batch_get():
+    """고객 여러 명 조회: POST /customers:batchGet {"ids": [1, 2, 3]}"""
+    return batch_response(customer_store)
+
+@app.post("/products:batchGet")
+def products_batch_get():
+    """상품 여러 개 조회: POST /products:batchGet {"ids": [101, 102]}"""
+    return batch_response(product_store)
 
 # ---------------------------
 if __name__ == "__main__":
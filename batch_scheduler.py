@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Timetable 배치 드라이버 - 여러 (학과, 학기, 기준일) 작업을 한 번의 실행으로 배정
+
+- manifest(CSV 또는 JSON) 한 행 = 작업 1개
+    term        : 학기 이름 (필수, 예: 2025-2)
+    department  : --department-filter 값 (비우면 전체)
+    anchor_date : 구글 캘린더 기준 주 월요일 (기본 2025-11-03)
+    courses     : 과목 파일 (비우면 --courses 값)
+    out_dir     : 산출물 폴더 (비우면 <out-root>/<term>/<department>)
+- 과목/강의실 파일은 파일별로 한 번만 읽음
+- 같은 term의 작업은 강의실·교수·학과-학년 점유 상태를 공유하며 manifest 순서대로 배정
+  (학과끼리 같은 강의실을 두고 경쟁, 외부대여-타강의실1은 마지막 순위로만 사용)
+- department 필터가 겹쳐 같은 과목 행이 한 term의 여러 작업에 걸리면 처음 작업에만 배정하고
+  뒤 작업에서는 건너뜀 (batch_summary.csv의 skipped_courses)
+- 서로 다른 term은 독립이므로 --workers 개 프로세스로 병렬 실행
+- 산출물: 작업별 4종 + <out-root>/<term>/ 학기 전체 4종 + <out-root>/batch_summary.csv
+  (작업별 vacant_slots.csv/utilization.png도 같은 term 전체 점유 기준)
+
+사용 예시:
+  python batch_scheduler.py --manifest jobs.csv --courses courses_data.csv --rooms rooms.csv \
+    --out-root out --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from main_scheduler import (
+    BORROWED_ROOM, COURSE_COLUMNS, COURSE_TEXT_COLUMNS, ScheduleState, build_courses_frame, build_grid,
+    course_order_key, ensure_rooms_csv, export_outputs, read_csv_auto,
+)
+
+def read_manifest(path, default_courses):
+    if path.lower().endswith(".json"):
+        df = pd.read_json(path, dtype=False)
+    else:
+        df = read_csv_auto(path)
+    if "term" not in df.columns:
+        raise RuntimeError(f"manifest에 term 열이 없습니다: {path}")
+    df = df.astype(object).where(df.notna(), "")
+    jobs = []
+    for i, r in enumerate(df.to_dict(orient="records")):
+        jobs.append({
+            "job": i,
+            "term": str(r["term"]).strip(),
+            "department": str(r.get("department", "")).strip(),
+            "anchor_date": str(r.get("anchor_date", "")).strip() or "2025-11-03",
+            "courses": str(r.get("courses", "")).strip() or default_courses,
+            "out_dir": str(r.get("out_dir", "")).strip(),
+        })
+    return jobs
+
+def _parse_anchor(text):
+    try:
+        return datetime.strptime(text, "%Y-%m-%d")
+    except Exception:
+        print(f"[WARN] anchor-date 파싱 실패({text}). 2025-11-03으로 대체")
+        return datetime(2025, 11, 3)
+
+def _export_rooms(rooms, assigns):
+    used_borrowed = any(str(a["room_id"]) == BORROWED_ROOM["room_id"] for a in assigns)
+    return rooms + ([BORROWED_ROOM] if used_borrowed else []), used_borrowed
+
+def run_term(term, jobs, raw_by_path, rooms, opts):
+    """한 학기의 작업들을 공유 점유 상태 위에서 순서대로 배정하고 산출물 저장. 작업별 요약 반환"""
+    GRID = build_grid(opts["start_hour"], opts["end_hour"], opts["slot_minutes"])
+    state_opts = dict(respect_capacity=opts["respect_capacity"],
+                      check_instructor=opts["check_instructor"],
+                      check_cohort=opts["check_cohort"],
+                      slot_minutes=opts["slot_minutes"])
+    # 외부대여-타강의실1은 작업마다 일반 강의실로 다 배치한 뒤 남은 시수에만 사용 (main_scheduler와 같은 순서)
+    shared = ScheduleState(rooms + ([BORROWED_ROOM] if opts["borrow"] else []), GRID,
+                           fallback_rooms=[BORROWED_ROOM["room_id"]], **state_opts)
+    term_assigns, summary, exports = [], [], []
+    seen = set()  # 이 term에서 이미 배정한 과목 행 (courses 파일, 교과목코드, 교수, 학과-학년, 같은 내용 중 순번)
+    for job in jobs:
+        t0 = time.perf_counter()
+        row = {"job": job["job"], "term": term, "department": job["department"] or "(전체)"}
+        try:
+            df_courses = build_courses_frame(raw_by_path[job["courses"]], department_filter=job["department"] or None)
+        except RuntimeError as e:
+            summary.append(dict(row, status="error", message=str(e)))
+            continue
+        fresh, counts = [], {}
+        for c in df_courses.to_dict(orient="records"):
+            ident = (job["courses"], c["course_id"], c["instructor"], c["cohort"])
+            counts[ident] = counts.get(ident, 0) + 1
+            if (ident, counts[ident]) not in seen:
+                seen.add((ident, counts[ident]))
+                fresh.append(c)
+        state = ScheduleState(shared.rooms, GRID, shared=shared, **state_opts)
+        unplaced = state.apply(added=sorted(fresh, key=course_order_key))
+        assigns = state.assignments()
+        term_assigns.extend(assigns)
+
+        out_dir = job["out_dir"] or os.path.join(opts["out_root"], term, job["department"] or "all")
+        _, used_borrowed = _export_rooms(rooms, assigns)
+        if assigns:
+            exports.append((assigns, job["anchor_date"], out_dir))
+        if unplaced:
+            os.makedirs(out_dir, exist_ok=True)
+            pd.DataFrame(unplaced).to_csv(os.path.join(out_dir, "unplaced_hours.csv"), index=False, encoding="utf-8-sig")
+        summary.append(dict(
+            row, status="ok" if not unplaced else "partial",
+            courses=len(fresh), skipped_courses=len(df_courses) - len(fresh), placed_rows=len(assigns),
+            unplaced_hours=sum(u["hours"] for u in unplaced),
+            borrowed="YES" if used_borrowed else "NO",
+            seconds=round(time.perf_counter() - t0, 3), out_dir=out_dir,
+        ))
+
+    if term_assigns:
+        export_rooms, _ = _export_rooms(rooms, term_assigns)
+        # 작업별 빈 슬롯/가동률도 학기 전체 점유 기준 (다른 학과가 쓰는 슬롯을 빈 것으로 내지 않게)
+        for assigns, anchor, out_dir in exports:
+            export_outputs(assigns, GRID, export_rooms, _parse_anchor(anchor), out_dir, occupancy=term_assigns)
+        export_outputs(term_assigns, GRID, export_rooms, _parse_anchor(jobs[0]["anchor_date"]),
+                       os.path.join(opts["out_root"], term))
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Timetable 배치 드라이버 (학과 × 학기 작업 목록)")
+    parser.add_argument("--manifest", required=True, help="작업 목록 CSV/JSON (term, department, anchor_date[, courses, out_dir])")
+    parser.add_argument("--courses", default="courses_data.csv", help="manifest에 courses가 없을 때 쓰는 과목 파일")
+    parser.add_argument("--rooms", default="rooms.csv", help="강의실 CSV (기본: rooms.csv)")
+    parser.add_argument("--out-root", default="out", help="산출물 최상위 폴더 (기본: out)")
+    parser.add_argument("--workers", type=int, default=1, help="학기 단위 병렬 프로세스 수 (기본 1)")
+    parser.add_argument("--start-hour", type=int, default=9, help="하루 시작 시간 (기본 9)")
+    parser.add_argument("--end-hour", type=int, default=21, help="하루 종료 시간 (기본 21; 자신은 포함 안 됨)")
+    parser.add_argument("--slot-minutes", type=int, choices=[60, 30], default=60, help="시간 블록 단위(분, 기본 60)")
+    parser.add_argument("--respect-capacity", action="store_true", help="rooms.csv capacity를 수강인원과 비교하여 초과 시 배정 금지")
+    parser.add_argument("--allow-instructor-overlap", action="store_true", help="같은 교수의 동시간대 중복 배정 허용 (기본: 금지)")
+    parser.add_argument("--allow-cohort-overlap", action="store_true", help="같은 학과-학년의 동시간대 중복 배정 허용 (기본: 금지)")
+    parser.add_argument("--no-borrow", action="store_true", help="외부대여-타강의실1을 쓰지 않음 (못 넣은 시수는 unplaced_hours.csv)")
+    args = parser.parse_args()
+
+    jobs = read_manifest(args.manifest, args.courses)
+    if not jobs:
+        print("[ERROR] manifest에 작업이 없습니다.")
+        sys.exit(1)
+
+    # 입력은 파일별로 한 번만 읽음 (필요한 열만)
+    text_dtype = {c: str for c in COURSE_TEXT_COLUMNS}
+    raw_by_path = {path: read_csv_auto(path, usecols=COURSE_COLUMNS, dtype=text_dtype)
+                   for path in dict.fromkeys(j["courses"] for j in jobs)}
+    df_rooms = ensure_rooms_csv(args.rooms)
+    if not args.respect_capacity:
+        # 무시 모드: 큰 수로 통일
+        df_rooms = df_rooms.copy()
+        df_rooms["capacity"] = 999999
+    rooms = df_rooms.to_dict(orient="records")
+
+    opts = dict(start_hour=args.start_hour, end_hour=args.end_hour, slot_minutes=args.slot_minutes,
+                respect_capacity=args.respect_capacity,
+                check_instructor=not args.allow_instructor_overlap,
+                check_cohort=not args.allow_cohort_overlap,
+                borrow=not args.no_borrow, out_root=args.out_root)
+    by_term = {}
+    for j in jobs:
+        by_term.setdefault(j["term"], []).append(j)
+
+    t0 = time.perf_counter()
+    tasks = [(term, tjobs, {p: raw_by_path[p] for p in {j["courses"] for j in tjobs}}, rooms, opts)
+             for term, tjobs in by_term.items()]
+    if args.workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            results = list(ex.map(run_term, *zip(*tasks)))
+    else:
+        results = [run_term(*t) for t in tasks]
+
+    summary = pd.DataFrame([row for rows in results for row in rows]).sort_values("job").convert_dtypes()
+    os.makedirs(args.out_root, exist_ok=True)
+    summary_path = os.path.join(args.out_root, "batch_summary.csv")
+    summary.to_csv(summary_path, index=False, encoding="utf-8-sig")
+
+    print(f"[DONE] {len(jobs)}개 작업 / {len(by_term)}개 학기 ({time.perf_counter() - t0:.2f}s)")
+    print(summary.drop(columns=["out_dir"], errors="ignore").to_string(index=False))
+    print(" - batch_summary.csv:", summary_path)
+
+if __name__ == "__main__":
+    main()
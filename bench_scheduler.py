@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Timetable 벤치마크 - 합성 과목/강의실 데이터로 단계별 시간·메모리·배정률 측정
+
+- 합성 데이터: courses_data.csv와 같은 열(과정, 개설학과, 교과목코드, 교과목명, 개설학년, 영역구분,
+  수강인원, 강좌대표교수, 강좌담당교수, 수업주수, 교과목학점, 강의유형구분), seed 고정 시 동일
+- 단계: build_courses_frame → try_schedule → export_outputs(차트 제외)
+- 배정률: try_schedule이 실패하면 같은 순서의 증분 배치(ScheduleState)로 넣을 수 있는 비율
+- 결과를 JSON으로 저장(--save)하고, 이전 결과(--compare)보다 느려진 단계를 표시
+
+사용 예시:
+  python bench_scheduler.py --sizes 100 1000 10000 --save bench_baseline.json
+  python bench_scheduler.py --sizes 100 1000 10000 --compare bench_baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from main_scheduler import (
+    ScheduleState, build_courses_frame, build_grid, course_order_key, export_outputs, try_schedule,
+)
+
+DEPTS = ["소프트웨어융합과", "빅데이터과", "코딩전공", "인공지능과", "정보보안과", "게임콘텐츠과", "전자공학과", "기계공학과"]
+SUBJECTS = ["프로그래밍", "데이터베이스", "네트워크", "운영체제", "자료구조", "웹개발", "머신러닝", "캡스톤디자인"]
+NAMES = "김이박최정강조윤장임한오서신권황안송류홍"
+
+def generate_courses(n_sections, seed=0):
+    """합성 과목 카탈로그 (교수 1인당 약 4분반, 학과-학년당 약 10분반, 실습 40%)"""
+    rng = random.Random(seed)
+    n_inst = max(1, n_sections // 4)
+    n_dept = max(1, n_sections // 40)
+    instructors = [f"{NAMES[i % len(NAMES)]}교수{i}" for i in range(n_inst)]
+    rows = []
+    for i in range(n_sections):
+        dept = f"{DEPTS[i % n_dept % len(DEPTS)]}{i % n_dept}"
+        prof = rng.choice(instructors)
+        rows.append({
+            "과정": "정규일반",
+            "개설학과": dept,
+            "교과목코드": f"S{i // 2:06d}",  # 2분반씩 같은 코드
+            "교과목명": f"{rng.choice(SUBJECTS)}({i % 3 + 1})",
+            "개설학년": rng.randint(1, 4),
+            "영역구분": "전공",
+            "수강인원": rng.randint(10, 45),
+            "강좌대표교수": prof,
+            "강좌담당교수": prof,
+            "수업주수": 15,
+            "교과목학점": rng.choice([2, 3, 3, 3, 4]),
+            "강의유형구분": "실습" if rng.random() < 0.4 else "이론",
+        })
+    return pd.DataFrame(rows)
+
+def generate_rooms(n_sections, seed=0, slots_per_room=60, load=0.75):
+    """주당 수요 시수가 전체 강의실 슬롯의 load 정도가 되도록 강의실 수를 맞춘 합성 강의실 목록"""
+    rng = random.Random(seed + 1)
+    n_rooms = max(2, math.ceil(n_sections * 3.0 / slots_per_room / load))
+    return [{"room_id": f"R{i:05d}", "room_type": "lab" if i % 20 < 9 else "lecture",
+             "capacity": rng.choice([30, 40, 50, 60])} for i in range(n_rooms)]
+
+def _stage(fn, memory, repeat=1):
+    """(결과, 초, 최대 메모리 MB) — 시간은 repeat번 중 최솟값, 메모리는 tracemalloc으로 따로 한 번 더 실행해 측정"""
+    seconds = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        seconds = min(seconds, time.perf_counter() - t0)
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return out, round(seconds, 4), None if peak_mb is None else round(peak_mb, 2)
+
+def run_size(n_sections, seed=0, memory=True, repeat=1, start_hour=9, end_hour=21):
+    raw = generate_courses(n_sections, seed)
+    rooms = generate_rooms(n_sections, seed, slots_per_room=5 * (end_hour - start_hour))
+    stages = {}
+
+    df_courses, sec, mb = _stage(lambda: build_courses_frame(raw), memory, repeat)
+    stages["build_courses_frame"] = {"seconds": sec, "peak_mb": mb}
+    courses = df_courses.to_dict(orient="records")
+
+    (assigns, GRID), sec, mb = _stage(lambda: try_schedule(rooms, courses, start_hour, end_hour, False), memory, repeat)
+    stages["try_schedule"] = {"seconds": sec, "peak_mb": mb}
+
+    need = int(df_courses["hours_per_week"].clip(lower=0).sum())
+    if assigns is None:
+        # greedy가 중간에 멈추면, 같은 순서로 끝까지 넣어본 결과로 배정률 계산
+        state = ScheduleState(rooms, build_grid(start_hour, end_hour))
+        state.apply(added=sorted(courses, key=course_order_key))
+        assigns = state.assignments()
+        placed_ok = False
+    else:
+        placed_ok = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        anchor = datetime(2025, 11, 3)
+        _, sec, mb = _stage(lambda: export_outputs(assigns, GRID, rooms, anchor, tmp, chart=False), memory, repeat)
+    stages["export_outputs"] = {"seconds": sec, "peak_mb": mb}
+
+    return {
+        "sections": n_sections,
+        "rooms": len(rooms),
+        "hours_needed": need,
+        "hours_placed": len(assigns),
+        "placement_rate": round(len(assigns) / need, 4) if need else 1.0,
+        "greedy_complete": placed_ok,
+        "stages": stages,
+    }
+
+def compare(results, baseline, tolerance):
+    """baseline보다 (1 + tolerance)배 넘게 느려진 단계 목록"""
+    base = {r["sections"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        b = base.get(r["sections"])
+        if not b:
+            continue
+        for stage, m in r["stages"].items():
+            old = b["stages"].get(stage, {}).get("seconds")
+            if old and m["seconds"] > old * (1 + tolerance) and m["seconds"] - old > 0.005:
+                regressions.append(f"{r['sections']} sections / {stage}: {old:.4f}s → {m['seconds']:.4f}s")
+        if r["placement_rate"] < b.get("placement_rate", 0):
+            regressions.append(f"{r['sections']} sections / placement_rate: {b['placement_rate']} → {r['placement_rate']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Timetable 벤치마크 (합성 데이터)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="분반 수 목록 (기본: 100 1000 10000, 최대 100000 권장)")
+    parser.add_argument("--seed", type=int, default=0, help="합성 데이터 seed (기본 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="단계별 반복 횟수, 최솟값 사용 (기본 3)")
+    parser.add_argument("--no-memory", action="store_true", help="tracemalloc 메모리 측정 생략 (시간만)")
+    parser.add_argument("--save", default=None, help="결과 JSON 저장 경로 (baseline)")
+    parser.add_argument("--compare", default=None, help="비교할 baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="허용 성능 저하 비율 (기본 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        r = run_size(n, seed=args.seed, memory=not args.no_memory, repeat=args.repeat)
+        results.append(r)
+        st = r["stages"]
+        print(f"[BENCH] {n:>7} sections / {r['rooms']:>5} rooms | "
+              + " | ".join(f"{k} {v['seconds']:.3f}s" + (f" {v['peak_mb']:.1f}MB" if v["peak_mb"] is not None else "")
+                           for k, v in st.items())
+              + f" | placed {r['placement_rate']:.1%}")
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print("[DONE] baseline 저장:", args.save)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("[REGRESSION] 기준보다 느려지거나 배정률이 떨어진 항목:")
+            for line in regressions:
+                print(" -", line)
+            sys.exit(1)
+        print("[OK] baseline 대비 회귀 없음")
+
+if __name__ == "__main__":
+    main()
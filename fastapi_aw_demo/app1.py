@@ -1,14 +1,35 @@
 # app1.py
 from __future__ import annotations
 from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
 from functools import lru_cache
+import asyncio
+import hashlib
+import hmac
+import io
+import json
 import math
+import os
+import threading
+import time
+from typing import NamedTuple
 import numpy as np
 import pandas as pd
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, PlainTextResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from scoring import _customer, _round_list, score_churn, score_clv
 
-app = FastAPI(title="AdventureWorks 계산 리포트", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app):
+    reloader = start_reloader()
+    yield
+    if reloader:
+        reloader[1].set()
+
+app = FastAPI(title="AdventureWorks 계산 리포트", version="1.0.0", lifespan=lifespan)
 
 # ====== 엑셀 경로 자동 탐색 ======
 BASE = Path(__file__).parent
@@ -25,9 +46,19 @@ if EXCEL_PATH is None:
     )
 
 # ====== 데이터 로드 (캐시) ======
-@lru_cache(maxsize=1)
-def load_data():
-    xls = pd.ExcelFile(EXCEL_PATH)
+# 엑셀 파싱은 느리므로 처음 한 번 Feather(Arrow IPC, 비압축)로 바꿔 두고 이후에는 memory-map으로 읽음
+# 캐시 키: 엑셀 mtime/크기가 같으면 그대로 사용, 다르면 sha256을 비교해 내용이 바뀐 경우에만 다시 변환
+CACHE_DIR = Path(os.environ.get("AW_CACHE_DIR", BASE / "data" / ".cache"))
+CACHE_TABLES = ("sales", "customers", "products")
+
+# compact 모드(기본): 지표에 쓰는 열만 남기고 키는 int32, 지역/분류는 category, 금액은 손실이 없을 때만 float32
+# AW_COMPACT=0 이면 시트의 모든 열을 기본 dtype으로 유지
+COMPACT = os.environ.get("AW_COMPACT", "1") != "0"
+SALES_COLUMNS = ["SalesOrderLineKey", "CustomerKey", "ProductKey", "Order Quantity", "Sales Amount", "Date"]
+
+def _read_excel(source=None):
+    """source: 엑셀 경로 또는 이미 읽어 둔 바이트 버퍼 (기본 EXCEL_PATH)"""
+    xls = pd.ExcelFile(EXCEL_PATH if source is None else source)
     sales = pd.read_excel(xls, sheet_name="Sales_data")
     date  = pd.read_excel(xls, sheet_name="Date_data")[["DateKey", "Date"]]
     cust  = pd.read_excel(xls, sheet_name="Customer_data")[
@@ -41,147 +72,541 @@ def load_data():
     sales["Date"] = pd.to_datetime(sales["Date"])
     return sales, cust, prod
 
-SALES, CUSTOMERS, PRODUCTS = load_data()
+def _to_int32(col):
+    if pd.api.types.is_integer_dtype(col) and len(col) and col.min() >= -2**31 and col.max() < 2**31:
+        return col.astype("int32")
+    return col
 
-# ====== 예측/지표 유틸 ======
-def _orders_of_customer(df_sales, cid: int):
-    return df_sales[df_sales["CustomerKey"] == cid].sort_values("Date")
+def _to_float32_if_exact(col):
+    f32 = col.astype("float32")
+    exact = (f32.astype("float64") == col) | col.isna()
+    return f32 if exact.all() else col
 
-def _next_purchase(df_sales, cid: int):
-    df = _orders_of_customer(df_sales, cid)
-    if df.empty or df["Date"].nunique() < 2:
-        # 글로벌 중앙 간격 사용
-        gaps_by_cust = df_sales.groupby("CustomerKey")["Date"].apply(
-            lambda s: s.sort_values().diff().dt.days.median()
-        )
-        global_median = int(gaps_by_cust.dropna().median()) if gaps_by_cust.notna().any() else 30
-        return None, global_median, None  # last, median_gap, next
-    gaps = df["Date"].diff().dt.days.dropna()
-    median_gap = int(max(1, round(gaps.median())))
-    last_date = df["Date"].max().date()
-    next_date = (pd.Timestamp(last_date) + pd.Timedelta(days=median_gap)).date()
-    return last_date, median_gap, next_date
+def compact_frames(sales, cust, prod):
+    """SALES/CUSTOMERS/PRODUCTS를 지표 계산에 필요한 만큼만 작은 dtype으로"""
+    sales = sales[SALES_COLUMNS].copy()
+    for c in ("SalesOrderLineKey", "CustomerKey", "ProductKey", "Order Quantity"):
+        sales[c] = _to_int32(sales[c])
+    sales["Sales Amount"] = _to_float32_if_exact(sales["Sales Amount"])
+    cust = cust.assign(**{"CustomerKey": _to_int32(cust["CustomerKey"]),
+                          "City": cust["City"].astype("category"),
+                          "Country-Region": cust["Country-Region"].astype("category")})
+    prod = prod.assign(**{"ProductKey": _to_int32(prod["ProductKey"]),
+                          "Category": prod["Category"].astype("category"),
+                          "Subcategory": prod["Subcategory"].astype("category")})
+    return sales, cust, prod
+
+def frame_bytes(frames):
+    """{테이블: 메모리 바이트(deep)}"""
+    return {name: int(df.memory_usage(deep=True).sum()) for name, df in zip(CACHE_TABLES, frames)}
+
+def _memory_report(before, after):
+    lines = [f"  {name:<10} {before[name] / 2**20:8.2f}MB → {after[name] / 2**20:8.2f}MB" for name in CACHE_TABLES]
+    total = f"  {'total':<10} {sum(before.values()) / 2**20:8.2f}MB → {sum(after.values()) / 2**20:8.2f}MB"
+    return "\n".join(["[INFO] compact 로드 메모리 (변환 전 → 후)"] + lines + [total])
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _cache_valid(manifest_path, st):
+    """캐시 manifest가 현재 엑셀과 같은 내용인지 (mtime/크기 → sha256 순으로 확인)"""
+    try:
+        meta = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    if not all((CACHE_DIR / f"{name}.feather").exists() for name in CACHE_TABLES):
+        return False
+    if meta.get("compact") != COMPACT:
+        return False
+    if meta.get("mtime_ns") == st.st_mtime_ns and meta.get("size") == st.st_size:
+        return True
+    if meta.get("sha256") != _file_sha256(EXCEL_PATH):
+        return False
+    # 내용은 같고 mtime만 바뀜 (복사/touch): 다음부터 해시 생략
+    meta.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+    _atomic_write_text(manifest_path, json.dumps(meta))
+    return True
+
+def _atomic_write_text(path, text):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+def _write_cache(frames, st, sha256, memory=None):
+    """st/sha256: frames를 만든 엑셀의 stat과 해시 (파싱 전에 잡은 값 — 파싱 중 파일이 바뀌어도 캐시와 어긋나지 않게)"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for name, df in zip(CACHE_TABLES, frames):
+        # 다른 워커가 읽는 중이어도 깨지지 않도록 임시 파일에 쓰고 교체
+        tmp = CACHE_DIR / f"{name}.feather.{os.getpid()}.tmp"
+        df.reset_index(drop=True).to_feather(tmp, compression="uncompressed")
+        os.replace(tmp, CACHE_DIR / f"{name}.feather")
+    meta = {"source": EXCEL_PATH.name, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+            "sha256": sha256, "compact": COMPACT, "memory": memory}
+    _atomic_write_text(CACHE_DIR / "manifest.json", json.dumps(meta))
 
-def _purchase_prob_30d(df_sales, cid: int, days: int = 30):
-    df = _orders_of_customer(df_sales, cid)
+def _read_cache():
+    import pyarrow.feather as feather
+    # memory_map: 여러 uvicorn 워커가 같은 파일 페이지(OS 페이지 캐시)를 공유
+    return tuple(
+        feather.read_table(CACHE_DIR / f"{name}.feather", memory_map=True).to_pandas(split_blocks=True)
+        for name in CACHE_TABLES
+    )
+
+def _load_excel(source=None):
+    """엑셀 읽기 (+ compact 변환). (frames, {"before": .., "after": ..} 또는 None)"""
+    frames = _read_excel(source)
+    if not COMPACT:
+        return frames, None
+    before = frame_bytes(frames)
+    frames = compact_frames(*frames)
+    memory = {"before": before, "after": frame_bytes(frames)}
+    print(_memory_report(memory["before"], memory["after"]))
+    return frames, memory
+
+@lru_cache(maxsize=1)
+def load_data():
+    st = EXCEL_PATH.stat()
+    try:
+        import pyarrow  # noqa: F401  (캐시는 선택 기능: 없으면 엑셀 직접 읽기)
+    except ImportError:
+        return _load_excel()[0]
+    try:
+        if _cache_valid(CACHE_DIR / "manifest.json", st):
+            return _read_cache()
+    except Exception as e:
+        print(f"[WARN] 데이터 캐시 읽기 실패, 엑셀에서 다시 변환: {e!r}")
+    # 파일을 한 번만 읽어 해시와 파싱을 같은 바이트로 (읽는 도중 바뀐 파일의 해시가 캐시에 붙지 않게)
+    data = EXCEL_PATH.read_bytes()
+    frames, memory = _load_excel(io.BytesIO(data))
+    try:
+        _write_cache(frames, st, hashlib.sha256(data).hexdigest(), memory)
+    except Exception as e:
+        print(f"[WARN] 데이터 캐시 저장 실패 (엑셀 직접 사용): {e!r}")
+    return frames
+
+# ====== 고객별 피처 테이블 (로드 시 1회 groupby) ======
+def build_customer_features(df_sales, df_prod):
+    """CustomerKey 인덱스 피처 테이블
+    - last_date / days_since: 마지막 구매일, 데이터 마지막 날짜 기준 경과 일수
+    - n_dates: 구매한 서로 다른 날짜 수
+    - median_gap: 날짜순 주문행 간격(일)의 중앙값 (행이 1개면 NaN)
+    - order_count: 주문행(SalesOrderLineKey) 수, sales_sum / sales_mean: 매출 합계/평균
+    - fav_subcategory: 가장 많이 산 Subcategory (동률이면 먼저 산 것)
+    """
+    s = df_sales[["CustomerKey", "Date", "SalesOrderLineKey", "Sales Amount", "ProductKey"]]
+    s = s.astype({"Sales Amount": "float64"})  # float32 저장분도 합계/평균은 float64로
+    s = s.sort_values(["CustomerKey", "Date"], kind="mergesort")
+    key = s["CustomerKey"]
+    gap = s["Date"].diff().dt.days.where(key.eq(key.shift()))
+    g = s.groupby("CustomerKey")
+    feat = pd.DataFrame({
+        "last_date": g["Date"].max(),
+        "n_dates": g["Date"].nunique(),
+        "median_gap": gap.groupby(key).median(),
+        "order_count": g["SalesOrderLineKey"].nunique(),
+        "sales_sum": g["Sales Amount"].sum(),
+        "sales_mean": g["Sales Amount"].mean(),
+    })
+    feat["days_since"] = (df_sales["Date"].max() - feat["last_date"]).dt.days
+
+    sub = s[["CustomerKey", "ProductKey"]].merge(df_prod[["ProductKey", "Subcategory"]], on="ProductKey", how="left")
+    sub = sub.dropna(subset=["Subcategory"])
+    sub["first"] = np.arange(len(sub))
+    cnt = sub.groupby(["CustomerKey", "Subcategory"], observed=True).agg(n=("first", "size"), first=("first", "min")).reset_index()
+    cnt = cnt.sort_values(["CustomerKey", "n", "first"], ascending=[True, False, True], kind="mergesort")
+    feat["fav_subcategory"] = cnt.drop_duplicates("CustomerKey").set_index("CustomerKey")["Subcategory"]
+    return feat
+
+def build_global_stats(df_sales, feat):
+    """데이터셋 전체 상수 (고객 수와 무관, 데이터 로드 시 1회 계산)
+    - baseline_30d: 고객별 월평균 주문행 수의 평균 / 4 (최대 0.95)
+    - median_gap: 고객별 median_gap의 중앙값 (없으면 NaN), median_gap_days: 그 정수값 (없으면 30)
+    - aov: 전체 주문행 평균 매출
+    """
     monthly_counts = df_sales.groupby(
         ["CustomerKey", df_sales["Date"].dt.to_period("M")]
     ).size().groupby("CustomerKey").mean()
     baseline = float(min(0.95, (monthly_counts.mean() or 0) / 4)) if len(monthly_counts) else 0.25
-    if df.empty:
+    gaps = feat["median_gap"].dropna()
+    return {
+        "baseline_30d": baseline,
+        "median_gap": gaps.median() if len(gaps) else np.nan,
+        "median_gap_days": int(gaps.median()) if len(gaps) else 30,
+        "aov": df_sales["Sales Amount"].astype("float64").mean(),
+    }
+
+REC_TOP_N = 50  # 서브카테고리별로 보관할 추천 후보 수
+
+def build_rec_index(df_sales, df_prod, top_n: int = REC_TOP_N):
+    """추천 인덱스: Order Quantity 합계 내림차순(동률은 ProductKey 오름차순) 상품 목록
+    - by_subcategory: {Subcategory: [(ProductKey, Product, 수량), ...]} (최대 top_n개)
+    - all: 전체 상품 기준 목록 (선호 서브카테고리가 없는 고객용)
+    """
+    merged = df_sales[["ProductKey", "Order Quantity"]].merge(
+        df_prod[["ProductKey", "Product", "Subcategory"]], on="ProductKey", how="left"
+    )
+    qty = (
+        merged.groupby(["ProductKey", "Product"])["Order Quantity"].sum().rename("qty").reset_index()
+        .sort_values(["qty", "ProductKey"], ascending=[False, True], kind="mergesort")
+    )
+    sub = qty.merge(df_prod[["ProductKey", "Subcategory"]].drop_duplicates("ProductKey"), on="ProductKey", how="left")
+    sub = sub.dropna(subset=["Subcategory"]).groupby("Subcategory", sort=False, observed=True).head(top_n)
+
+    def _items(df):
+        return list(zip(df["ProductKey"].tolist(), df["Product"].tolist(), df["qty"].tolist()))
+
+    return {
+        "by_subcategory": {k: _items(g) for k, g in sub.groupby("Subcategory", sort=False, observed=True)},
+        "all": _items(qty.head(top_n)),
+    }
+
+# ====== 데이터 스냅샷 (원본 프레임 + 파생 인덱스를 한 묶음으로 교체) ======
+# 요청은 시작할 때 current_snapshot()을 한 번 잡고 끝까지 그 스냅샷만 사용 →
+# 리로드 중에도 진행 중인 요청은 옛 데이터로 일관되게 끝남
+class Snapshot(NamedTuple):
+    sales: pd.DataFrame
+    customers: pd.DataFrame
+    products: pd.DataFrame
+    features: pd.DataFrame
+    stats: dict
+    rec_index: dict
+    version: str
+    mtime_ns: int
+    size: int
+    loaded_at: float
+
+def data_version(st=None):
+    """데이터 버전 지문: 엑셀 mtime/크기 + compact 모드 (같은 파일을 보는 워커끼리 같은 값)"""
+    st = st or EXCEL_PATH.stat()
+    return hashlib.sha1(f"{st.st_mtime_ns}:{st.st_size}:{COMPACT}".encode()).hexdigest()[:16]
+
+def build_snapshot(frames=None):
+    # stat을 먼저 잡아 두면, 읽는 도중 파일이 바뀌어도 다음 확인 때 다시 리로드됨
+    st = EXCEL_PATH.stat()
+    sales, cust, prod = frames if frames is not None else load_data()
+    feat = build_customer_features(sales, prod)
+    return Snapshot(sales, cust, prod, feat, build_global_stats(sales, feat), build_rec_index(sales, prod),
+                    data_version(st), st.st_mtime_ns, st.st_size, time.time())
+
+def _publish(snap):
+    """스냅샷 교체 (참조 대입 한 번). 모듈 전역 SALES/FEATURES 등도 같은 스냅샷을 가리키게 함"""
+    global SNAPSHOT, SALES, CUSTOMERS, PRODUCTS, FEATURES, STATS, REC_INDEX
+    SALES, CUSTOMERS, PRODUCTS = snap.sales, snap.customers, snap.products
+    FEATURES, STATS, REC_INDEX = snap.features, snap.stats, snap.rec_index
+    SNAPSHOT = snap
+
+_publish(build_snapshot())
+
+def current_snapshot() -> Snapshot:
+    return SNAPSHOT
+
+RELOAD_INTERVAL = float(os.environ.get("AW_RELOAD_INTERVAL", "30"))  # 초, 0이면 감시 안 함
+_RELOAD_LOCK = threading.Lock()
+RELOAD_STATUS = {"last_error": None, "last_checked": None}
+
+def source_changed(snap=None) -> bool:
+    snap = snap or SNAPSHOT
+    st = EXCEL_PATH.stat()
+    return (st.st_mtime_ns, st.st_size) != (snap.mtime_ns, snap.size)
+
+def reload_data(force: bool = False) -> bool:
+    """엑셀이 바뀌었으면(force면 무조건) 새 스냅샷을 만들어 교체. 교체했으면 True
+
+    새 프레임/피처/통계/추천 인덱스와 기본 홈 화면까지 미리 만든 뒤 교체하므로
+    교체 직후 요청도 cold start 없이 응답. 동시에 하나만 실행됨
+    """
+    with _RELOAD_LOCK:
+        RELOAD_STATUS["last_checked"] = time.time()
+        if not force and not source_changed():
+            return False
+        load_data.cache_clear()
+        snap = build_snapshot()
+        _warm(snap)
+        _publish(snap)
+        RELOAD_STATUS["last_error"] = None
+        return True
+
+def _watch(stop: threading.Event, interval: float):
+    while not stop.wait(interval):
+        try:
+            if reload_data():
+                print(f"[INFO] 데이터 리로드 완료: version {SNAPSHOT.version}")
+        except Exception as e:
+            RELOAD_STATUS["last_error"] = repr(e)
+            print(f"[WARN] 데이터 리로드 실패 (이전 스냅샷 유지): {e!r}")
+
+def start_reloader(interval: float = RELOAD_INTERVAL):
+    """백그라운드 감시 스레드 시작. (스레드, 종료 이벤트) 반환 (interval <= 0이면 None)"""
+    if interval <= 0:
+        return None
+    stop = threading.Event()
+    thread = threading.Thread(target=_watch, args=(stop, interval), name="aw-reloader", daemon=True)
+    thread.start()
+    return thread, stop
+
+# ====== 예측/지표 유틸 ======
+def _next_purchase(feat, stats, cid: int):
+    f = _customer(feat, cid)
+    if f is None or f["n_dates"] < 2:
+        # 글로벌 중앙 간격 사용
+        return None, stats["median_gap_days"], None  # last, median_gap, next
+    median_gap = int(max(1, round(f["median_gap"])))
+    last_date = f["last_date"].date()
+    next_date = (pd.Timestamp(last_date) + pd.Timedelta(days=median_gap)).date()
+    return last_date, median_gap, next_date
+
+def _purchase_prob_30d(feat, stats, cid: int, days: int = 30):
+    f = _customer(feat, cid)
+    baseline = stats["baseline_30d"]
+    if f is None:
         return round(baseline, 3)
-    gaps = df["Date"].diff().dt.days.dropna()
-    med = gaps.median() if not gaps.empty else np.nan
+    med = f["median_gap"]
     if np.isnan(med):
-        med = df_sales.groupby("CustomerKey")["Date"].apply(
-            lambda s: s.sort_values().diff().dt.days.median()
-        ).dropna().median()
-    time_since = (df_sales["Date"].max() - df["Date"].max()).days
+        med = stats["median_gap"]
+    time_since = f["days_since"]
     x = (days - (med - time_since)) / max(7, med)
     p = 1.0 / (1.0 + math.exp(-x))
     prob = 0.7 * p + 0.3 * baseline
     return round(float(prob), 3)
 
-def _clv_naive(df_sales, cid: int):
-    df = _orders_of_customer(df_sales, cid)
-    hist = df["Sales Amount"].sum() if not df.empty else 0.0
-    aov = (df["Sales Amount"].mean() if not df.empty else df_sales["Sales Amount"].mean()) or 0.0
-    n_orders = df["SalesOrderLineKey"].nunique()
-    recent_days = (df_sales["Date"].max() - df["Date"].max()).days if not df.empty else 365
-    if n_orders >= 10 and recent_days <= 60:
-        expected = 5
-    elif n_orders >= 5 and recent_days <= 120:
-        expected = 3
-    else:
-        expected = 1
-    clv = hist + expected * aov
-    return round(float(hist), 2), round(float(aov), 2), int(expected), round(float(clv), 2)
-
-def _churn(df_sales, cid: int):
-    df = _orders_of_customer(df_sales, cid)
-    if df.empty:
-        return 0.85, "high"
-    time_since = (df_sales["Date"].max() - df["Date"].max()).days
-    freq = df["SalesOrderLineKey"].nunique()
-    ts_rank = min(1.0, time_since / 180)
-    freq_rank = 1.0 - min(1.0, freq / 10.0)
-    score = float(np.clip(0.6 * ts_rank + 0.4 * freq_rank, 0, 1))
-    label = "high" if score >= 0.66 else ("medium" if score >= 0.33 else "low")
-    return round(score, 3), label
-
-def _top_rec(df_sales, df_prod, cid: int):
-    merged = df_sales.merge(df_prod, on="ProductKey", how="left")
-    df = _orders_of_customer(df_sales, cid)
-    if not df.empty:
-        mine = df.merge(df_prod, on="ProductKey", how="left")
-        if mine["Subcategory"].notna().any():
-            fav = mine["Subcategory"].value_counts().idxmax()
-            cand = merged[merged["Subcategory"] == fav]
-        else:
-            cand = merged
-    else:
-        cand = merged
-    top = (
-        cand.groupby(["ProductKey", "Product"])["Order Quantity"]
-        .sum().sort_values(ascending=False).head(1)
-    )
-    if len(top) == 0:
-        return None
-    (pk, name), _ = top.index[0], top.iloc[0]
-    return name
+def _rec_items(rec, fav):
+    return rec["by_subcategory"].get(fav, []) if fav is not None else rec["all"]
+
+def _recommendations(rec, feat, cid: int, n: int = 1):
+    """(선호 서브카테고리, 상위 n개 [(ProductKey, Product, 수량)])"""
+    f = _customer(feat, cid)
+    fav = f["fav_subcategory"] if f is not None and pd.notna(f["fav_subcategory"]) else None
+    return fav, _rec_items(rec, fav)[:n]
+
+def _top_rec(rec, feat, cid: int):
+    _, items = _recommendations(rec, feat, cid, n=1)
+    return items[0][1] if items else None
+
+# ====== 여러 고객 지표 한 번에 (벡터화) ======
+METRIC_COLUMNS = [
+    "CustomerKey", "Customer", "City", "Country",
+    "Last Purchase", "Median Gap (days)", "Next Expected Purchase", "Prob. Purchase (30d)",
+    "Historical Sales", "AOV", "Expected Future Orders", "Naive CLV",
+    "Churn Score", "Churn Risk", "Top Recommendation",
+]
+
+def _none_if_na(values):
+    return [None if pd.isna(v) else v for v in values]
+
+def _date_strs(dates):
+    return _none_if_na(dates.dt.strftime("%Y-%m-%d"))
+
+def customer_metrics(feat, stats, rec, cust, cids, days: int = 30):
+    """_next_purchase/_purchase_prob_30d/_clv_naive/_churn/_top_rec를 cids 전체에 대해 한 번에 계산
+    (고객별 함수와 같은 값, 피처 테이블에 없는 고객은 같은 기본값). 열 이름은 홈 표와 동일
+    """
+    cids = pd.Index(cids)
+    f = feat.reindex(cids)
+    known = cids.isin(feat.index)
+
+    # 다음 구매 시기
+    has_gap = known & (f["n_dates"] >= 2).to_numpy()
+    gap = np.where(has_gap, np.maximum(1, f["median_gap"].round().fillna(1)), stats["median_gap_days"]).astype(int)
+    last = f["last_date"].dt.normalize().where(has_gap)
+    nxt = last + pd.to_timedelta(gap, unit="D")
+
+    # 30일 구매 확률
+    baseline = stats["baseline_30d"]
+    med = f["median_gap"].fillna(stats["median_gap"])
+    x = (days - (med - f["days_since"])) / np.maximum(7, med)
+    p = 1.0 / (1.0 + np.exp(-x))
+    prob = (0.7 * p + 0.3 * baseline).where(known, baseline)
+
+    # CLV (피처가 없는 고객은 _clv_naive와 같은 기본값으로 채워 계산)
+    base = f[["sales_sum", "sales_mean", "order_count", "days_since"]].copy()
+    base.loc[~known] = [0.0, stats["aov"], 0, 365]
+    clv = score_clv(base)
+
+    # 이탈 위험
+    churn = score_churn(f)
+    churn.loc[~known, ["churn_score", "churn_risk"]] = [0.85, "high"]
+
+    # 추천 (선호 서브카테고리 → 인덱스 조회)
+    fav = _none_if_na(f["fav_subcategory"].astype(object))
+    top = [(items[0][1] if items else None) for items in (_rec_items(rec, v) for v in fav)]
+
+    info = cust.drop_duplicates("CustomerKey").set_index("CustomerKey").reindex(cids)
+    return pd.DataFrame({
+        "CustomerKey": cids.tolist(),
+        "Customer": _none_if_na(info["Customer"]),
+        "City": _none_if_na(info["City"].astype(object)),
+        "Country": _none_if_na(info["Country-Region"].astype(object)),
+        "Last Purchase": _date_strs(last),
+        "Median Gap (days)": gap.tolist(),
+        "Next Expected Purchase": _date_strs(nxt.where(has_gap)),
+        "Prob. Purchase (30d)": _round_list(prob, 3),
+        "Historical Sales": clv["hist"].tolist(),
+        "AOV": clv["aov"].tolist(),
+        "Expected Future Orders": clv["expected_orders"].tolist(),
+        "Naive CLV": clv["clv"].tolist(),
+        "Churn Score": churn["churn_score"].tolist(),
+        "Churn Risk": churn["churn_risk"].tolist(),
+        "Top Recommendation": top,
+    }, columns=METRIC_COLUMNS)
+
+def _top_customers(feat, n: int, offset: int = 0):
+    """매출 합계 내림차순 (동률은 CustomerKey 오름차순) 고객 키"""
+    order = feat["sales_sum"].sort_values(ascending=False, kind="mergesort")
+    return order.index[offset:offset + n].tolist()
+
+# ====== 렌더링 결과 캐시 (데이터 버전 ETag) ======
+# 같은 데이터 버전에서 같은 요청은 같은 응답이므로, 렌더링 결과를 LRU에 두고 ETag/If-None-Match로 304 응답
+HOME_TOP_MAX = 500
+RESPONSE_CACHE_SIZE = 64
+
+class ResponseCache:
+    """크기 제한 LRU (키에 데이터 버전이 들어가므로 리로드 후 옛 항목은 자연히 밀려남)"""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+RESPONSE_CACHE = ResponseCache()
+
+def _etag_matches(header, etag: str) -> bool:
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag in tags
+
+def _cache_key(version: str, key: tuple):
+    return (version,) + key
+
+def _etag(key: tuple) -> str:
+    return '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+
+# ====== 무거운 pandas 작업 전용 실행기 ======
+# 렌더링/지표 계산은 이벤트 루프나 기본 스레드풀이 아니라 크기가 정해진 전용 스레드풀에서 실행
+# - 같은 키로 동시에 들어온 요청은 계산 하나를 같이 기다림 (coalescing)
+# - 실행 중 + 대기 중 작업이 한도를 넘으면 503 + Retry-After
+# (스냅샷이 이 프로세스 메모리에 있으므로 프로세스 풀 대신 스레드 사용; pandas/numpy 연산은 대부분 GIL을 풂)
+HEAVY_WORKERS = int(os.environ.get("AW_HEAVY_WORKERS", "2"))
+HEAVY_QUEUE = int(os.environ.get("AW_HEAVY_QUEUE", "8"))  # 실행 중 외에 기다릴 수 있는 작업 수
+RETRY_AFTER_SECONDS = 2
+
+class PoolSaturated(RuntimeError):
+    pass
+
+class HeavyExecutor:
+    def __init__(self, workers: int = HEAVY_WORKERS, queue: int = HEAVY_QUEUE):
+        self.limit = workers + queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aw-heavy")
+        self._inflight = {}  # key → asyncio.Future (이벤트 루프 안에서만 접근)
+        self._running = 0
+        self._reserved = 0  # reserve()로 잡힌 스트림 슬롯 수
+
+    def saturated(self) -> bool:
+        return self._running + self._reserved >= self.limit
+
+    def reserve(self) -> bool:
+        """스트리밍 응답 하나가 끝날 때까지 쓸 입장 슬롯 예약. 빈 슬롯이 없으면 False"""
+        if self.saturated():
+            return False
+        self._reserved += 1
+        return True
+
+    def release(self):
+        self._reserved -= 1
+
+    async def run(self, key, fn, admit: bool = True):
+        """fn()을 전용 풀에서 실행. key가 같은 작업이 진행 중이면 그 결과를 공유 (key=None이면 공유 안 함)
+        admit=False: 호출자가 reserve()로 잡아 둔 슬롯으로 실행 (입장 검사/슬롯 계산 생략)"""
+        fut = self._inflight.get(key) if key is not None else None
+        if fut is None:
+            if admit and self.saturated():
+                raise PoolSaturated()
+            fut = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(self._pool, fn))
+            if admit:
+                self._running += 1
+            fut.add_done_callback(lambda _: self._done(key, admit))
+            if key is not None:
+                self._inflight[key] = fut
+        # 한 요청이 끊겨도 같은 계산을 기다리는 다른 요청은 계속 받도록 shield
+        return await asyncio.shield(fut)
+
+    def _done(self, key, admitted):
+        if admitted:
+            self._running -= 1
+        if key is not None:
+            self._inflight.pop(key, None)
+
+HEAVY = HeavyExecutor()
+
+def _busy():
+    return HTTPException(status_code=503, detail="요청이 많아 잠시 후 다시 시도하세요.",
+                         headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+async def cached_response(request: Request, version: str, key: tuple, render, media_type: str):
+    """key(경로/파라미터)와 데이터 버전으로 ETag를 만들고, 일치하면 304, 아니면 캐시된(또는 전용 풀에서 새로 렌더링한) 본문"""
+    key = _cache_key(version, key)
+    etag = _etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body = RESPONSE_CACHE.get(key)
+    if body is None:
+        try:
+            body = await HEAVY.run(key, render)
+        except PoolSaturated:
+            raise _busy()
+        RESPONSE_CACHE.put(key, body)
+    return Response(body, media_type=media_type, headers=headers)
 
 # ====== 홈: 계산 결과 표 렌더링 ======
-@app.get("/", response_class=HTMLResponse)
-def home():
-    try:
-        # --- 요약 지표 ---
-        total_rows = len(SALES)
-        unique_customers = SALES["CustomerKey"].nunique()
-        unique_products = SALES["ProductKey"].nunique()
-        date_min = SALES["Date"].min().date()
-        date_max = SALES["Date"].max().date()
-        total_sales_amount = float(SALES["Sales Amount"].sum())
-
-        summary_df = pd.DataFrame({
-            "지표": ["총 주문 행 수","고객 수","상품 수","기간(시작)","기간(종료)","총 매출액"],
-            "값":  [f"{total_rows:,}", f"{unique_customers:,}", f"{unique_products:,}",
-                    str(date_min), str(date_max), f"{total_sales_amount:,.2f}"]
-        })
-
-        # --- 상위 고객 30명 기준 예측 테이블 ---
-        cust_sales = SALES.groupby("CustomerKey")["Sales Amount"].sum().sort_values(ascending=False)
-        top_customers = cust_sales.head(30).index.tolist()
-
-        rows = []
-        for cid in top_customers:
-            last_date, median_gap, next_date = _next_purchase(SALES, cid)
-            prob30 = _purchase_prob_30d(SALES, cid, days=30)
-            hist, aov, expected_orders, clv = _clv_naive(SALES, cid)
-            score, risk = _churn(SALES, cid)
-            rec = _top_rec(SALES, PRODUCTS, cid)
-            crow = CUSTOMERS[CUSTOMERS["CustomerKey"] == cid]
-            name = None if crow.empty else crow.iloc[0]["Customer"]
-            city = None if crow.empty else crow.iloc[0]["City"]
-            country = None if crow.empty else crow.iloc[0]["Country-Region"]
-            rows.append({
-                "CustomerKey": cid,
-                "Customer": name, "City": city, "Country": country,
-                "Last Purchase": None if last_date is None else str(last_date),
-                "Median Gap (days)": None if median_gap is None else int(median_gap),
-                "Next Expected Purchase": None if next_date is None else str(next_date),
-                "Prob. Purchase (30d)": prob30,
-                "Historical Sales": hist, "AOV": aov,
-                "Expected Future Orders": expected_orders, "Naive CLV": clv,
-                "Churn Score": score, "Churn Risk": risk, "Top Recommendation": rec,
-            })
-        pred_df = pd.DataFrame(rows)
-
-        # 표 렌더링 (pandas.to_html)
-        summary_html = summary_df.to_html(index=False, classes="table table-sm", border=0)
-        pred_html    = pred_df.to_html(index=False, classes="table table-sm", border=0)
-
-        # HTML 스켈레톤 (f-string 아님; placeholder 치환)
-        html = """
+def _render_home(snap: Snapshot, top: int = 30) -> str:
+    sales = snap.sales
+    # --- 요약 지표 ---
+    total_rows = len(sales)
+    unique_customers = sales["CustomerKey"].nunique()
+    unique_products = sales["ProductKey"].nunique()
+    date_min = sales["Date"].min().date()
+    date_max = sales["Date"].max().date()
+    total_sales_amount = float(sales["Sales Amount"].astype("float64").sum())
+
+    summary_df = pd.DataFrame({
+        "지표": ["총 주문 행 수","고객 수","상품 수","기간(시작)","기간(종료)","총 매출액"],
+        "값":  [f"{total_rows:,}", f"{unique_customers:,}", f"{unique_products:,}",
+                str(date_min), str(date_max), f"{total_sales_amount:,.2f}"]
+    })
+
+    # --- 상위 고객 top명 기준 예측 테이블 ---
+    top_customers = _top_customers(snap.features, top)
+    pred_df = customer_metrics(snap.features, snap.stats, snap.rec_index, snap.customers, top_customers, days=30)
+
+    # 표 렌더링 (pandas.to_html)
+    summary_html = summary_df.to_html(index=False, classes="table table-sm", border=0)
+    pred_html    = pred_df.to_html(index=False, classes="table table-sm", border=0)
+
+    # HTML 스켈레톤 (f-string 아님; placeholder 치환)
+    html = """
 <!doctype html>
 <html lang="ko">
 <head>
@@ -214,7 +639,7 @@ def home():
     </div>
 
     <div class="card">
-      <h2 style="margin:0 0 12px;">고객 예측 (상위 30명 · 매출 기준)</h2>
+      <h2 style="margin:0 0 12px;">고객 예측 (상위 %%TOP%%명 · 매출 기준)</h2>
       <div class="muted small">다음 구매 시기/구매 확률(30일)/CLV/이탈 위험/추천 상품 포함</div>
       <div style="overflow:auto; max-height:70vh;">%%PRED%%</div>
     </div>
@@ -222,13 +647,208 @@ def home():
 </body>
 </html>
 """
-        html = html.replace("%%EXCEL%%", EXCEL_PATH.as_posix())
-        html = html.replace("%%SUMMARY%%", summary_html)
-        html = html.replace("%%PRED%%", pred_html)
-        return HTMLResponse(html)
+    html = html.replace("%%EXCEL%%", EXCEL_PATH.as_posix())
+    html = html.replace("%%SUMMARY%%", summary_html)
+    html = html.replace("%%PRED%%", pred_html)
+    html = html.replace("%%TOP%%", str(top))
+    return html
+
+@app.get("/", response_class=HTMLResponse)
+async def home(request: Request, top: int = Query(30, ge=1, le=HOME_TOP_MAX)):
+    snap = current_snapshot()
+    try:
+        return await cached_response(request, snap.version, ("home", top), lambda: _render_home(snap, top),
+                                     "text/html; charset=utf-8")
+    except HTTPException:
+        raise
     except Exception as e:
         return PlainTextResponse("오류: " + repr(e), status_code=500)
 
+def _warm(snap: Snapshot):
+    """새 스냅샷의 기본 홈 화면을 교체 전에 미리 렌더링해 캐시에 넣음"""
+    RESPONSE_CACHE.put(_cache_key(snap.version, ("home", 30)), _render_home(snap, 30))
+
+@app.get("/customers/{cid}/recommendations")
+def customer_recommendations(cid: int, n: int = Query(5, ge=1, le=REC_TOP_N)):
+    snap = current_snapshot()
+    if cid not in snap.features.index and not (snap.customers["CustomerKey"] == cid).any():
+        raise HTTPException(status_code=404, detail=f"고객 {cid}을(를) 찾을 수 없습니다.")
+    fav, items = _recommendations(snap.rec_index, snap.features, cid, n=n)
+    return {
+        "CustomerKey": cid,
+        "subcategory": fav,
+        "items": [{"ProductKey": int(pk), "Product": name, "Order Quantity": int(q)} for pk, name, q in items],
+    }
+
+# ====== 고객 지표 API (CRM 동기화용) ======
+METRICS_MAX = 10_000   # 한 번에 요청할 수 있는 고객 수
+METRICS_CHUNK = 1_000  # 스트리밍 시 한 번에 계산/전송하는 고객 수
+
+def _metrics_arrow_schema():
+    import pyarrow as pa
+    types = {"CustomerKey": pa.int64(), "Median Gap (days)": pa.int64(), "Expected Future Orders": pa.int64(),
+             "Prob. Purchase (30d)": pa.float64(), "Historical Sales": pa.float64(), "AOV": pa.float64(),
+             "Naive CLV": pa.float64(), "Churn Score": pa.float64()}
+    return pa.schema([(c, types.get(c, pa.string())) for c in METRIC_COLUMNS])
+
+async def _stream_metrics(snap: Snapshot, cids, fmt: str):
+    """METRICS_CHUNK명씩 전용 풀에서 계산/직렬화해 흘려보냄
+    요청 시작 때 HEAVY.reserve()로 잡은 슬롯 하나를 스트림이 끝날 때(끊겨도) 반납"""
+    feat, stats, rec, cust = snap.features, snap.stats, snap.rec_index, snap.customers
+    parts = [cids[i:i + METRICS_CHUNK] for i in range(0, len(cids), METRICS_CHUNK)]
+
+    def compute(part):
+        return customer_metrics(feat, stats, rec, cust, part)
+
+    try:
+        if fmt == "ndjson":
+            for part in parts:
+                yield await HEAVY.run(None, lambda part=part: compute(part).to_json(
+                    orient="records", lines=True, force_ascii=False, date_format="iso"), admit=False)
+            return
+        import pyarrow as pa
+        schema = _metrics_arrow_schema()
+        buf = io.BytesIO()
+
+        def drain():
+            data = buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            return data
+
+        with pa.ipc.new_stream(buf, schema) as writer:
+            for part in parts:
+                def step(part=part):
+                    writer.write_batch(pa.RecordBatch.from_pandas(compute(part), schema=schema, preserve_index=False))
+                    return drain()
+                yield await HEAVY.run(None, step, admit=False)
+        yield drain()  # end-of-stream 표시
+    finally:
+        HEAVY.release()
+
+@app.get("/api/customers/metrics")
+async def customers_metrics_api(
+    ids: str | None = Query(None, description="쉼표로 구분한 CustomerKey 목록"),
+    top: int | None = Query(None, ge=1, le=METRICS_MAX, description="매출 상위 N명"),
+    offset: int = Query(0, ge=0, description="top과 함께 쓰는 시작 위치"),
+    format: str = Query("ndjson", pattern="^(ndjson|arrow)$"),
+):
+    snap = current_snapshot()
+    if (ids is None) == (top is None):
+        raise HTTPException(status_code=400, detail="ids 또는 top 중 하나만 지정하세요.")
+    if ids is not None:
+        try:
+            cids = [int(x) for x in ids.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids는 쉼표로 구분한 정수여야 합니다.")
+        if len(cids) > METRICS_MAX:
+            raise HTTPException(status_code=400, detail=f"ids는 최대 {METRICS_MAX}개까지 가능합니다.")
+    else:
+        cids = _top_customers(snap.features, top, offset)
+    if format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=406, detail="arrow 형식에는 pyarrow가 필요합니다.")
+        media_type = "application/vnd.apache.arrow.stream"
+    else:
+        media_type = "application/x-ndjson"
+    if not HEAVY.reserve():
+        raise _busy()
+    return StreamingResponse(_stream_metrics(snap, cids, format), media_type=media_type,
+                             headers={"X-Total-Count": str(len(cids)), "X-Data-Version": snap.version})
+
+# ====== 고객 세그먼트 (전체 고객 이탈 위험/CLV 분포) ======
+SEGMENT_BINS_MAX = 100
+
+def segment_summary(feat, bins: int = 10):
+    """score_churn/score_clv로 전체 고객을 한 번에 점수화해 위험 등급별 고객 수와 CLV 분포 요약"""
+    churn = score_churn(feat)
+    clv = score_clv(feat)
+    values = clv["clv"].astype("float64")
+    q = values.quantile([0.1, 0.25, 0.5, 0.75, 0.9]) if len(values) else pd.Series(dtype="float64")
+    counts, edges = np.histogram(values, bins=bins) if len(values) else (np.array([], dtype=int), np.array([]))
+    by_risk = values.groupby(churn["churn_risk"]).agg(["count", "mean", "median", "sum"])
+    return {
+        "customers": int(len(feat)),
+        "churn_risk": {r: int((churn["churn_risk"] == r).sum()) for r in ("high", "medium", "low")},
+        "expected_orders": {str(k): int(v) for k, v in clv["expected_orders"].value_counts().sort_index().items()},
+        "clv": {
+            "sum": round(float(values.sum()), 2),
+            "mean": round(float(values.mean()), 2) if len(values) else None,
+            "min": round(float(values.min()), 2) if len(values) else None,
+            "max": round(float(values.max()), 2) if len(values) else None,
+            "quantiles": {f"p{int(k * 100)}": round(float(v), 2) for k, v in q.items()},
+            "histogram": [{"from": round(float(lo), 2), "to": round(float(hi), 2), "count": int(c)}
+                          for lo, hi, c in zip(edges[:-1], edges[1:], counts)],
+        },
+        "clv_by_risk": {
+            r: {"count": int(row["count"]), "mean": round(float(row["mean"]), 2),
+                "median": round(float(row["median"]), 2), "sum": round(float(row["sum"]), 2)}
+            for r, row in by_risk.iterrows()
+        },
+    }
+
+@app.get("/api/segments")
+async def segments_api(request: Request, bins: int = Query(10, ge=1, le=SEGMENT_BINS_MAX)):
+    snap = current_snapshot()
+
+    def render():
+        return json.dumps(dict(segment_summary(snap.features, bins), version=snap.version), ensure_ascii=False)
+
+    return await cached_response(request, snap.version, ("segments", bins), render, "application/json")
+
+# ====== 관리: 데이터 리로드 / 버전 ======
+ADMIN_TOKEN = os.environ.get("AW_ADMIN_TOKEN")  # X-Admin-Token 헤더가 같아야 함 (미설정이면 관리 API 사용 불가)
+_RELOAD_QUEUED = threading.Lock()  # 백그라운드 리로드 스레드는 한 번에 하나만
+
+def _check_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="AW_ADMIN_TOKEN이 설정되지 않아 관리 API를 사용할 수 없습니다.")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="관리자 토큰이 필요합니다.")
+
+def _version_info():
+    snap = current_snapshot()
+    return {
+        "version": snap.version,
+        "source": EXCEL_PATH.name,
+        "mtime_ns": snap.mtime_ns,
+        "loaded_at": datetime.fromtimestamp(snap.loaded_at).isoformat(timespec="seconds"),
+        "reloading": _RELOAD_LOCK.locked(),
+        "last_error": RELOAD_STATUS["last_error"],
+    }
+
+@app.get("/admin/data-version")
+def admin_data_version():
+    return _version_info()
+
+@app.post("/admin/reload")
+def admin_reload(request: Request, wait: bool = False, force: bool = True):
+    """wait=false(기본)면 백그라운드에서 리로드하고 바로 202, wait=true면 교체까지 기다림
+    이미 리로드 중이거나 대기 중이면 새 스레드 없이 202 (accepted=false)"""
+    _check_admin(request)
+    if not wait:
+        if _RELOAD_LOCK.locked() or not _RELOAD_QUEUED.acquire(blocking=False):
+            return JSONResponse(dict(_version_info(), accepted=False), status_code=202)
+        threading.Thread(target=_reload_quietly, args=(force,), daemon=True).start()
+        return JSONResponse(dict(_version_info(), accepted=True), status_code=202)
+    try:
+        swapped = reload_data(force=force)
+    except Exception as e:
+        RELOAD_STATUS["last_error"] = repr(e)
+        raise HTTPException(status_code=500, detail=f"리로드 실패 (이전 데이터 유지): {e!r}")
+    return dict(_version_info(), reloaded=swapped)
+
+def _reload_quietly(force: bool):
+    try:
+        reload_data(force=force)
+    except Exception as e:
+        RELOAD_STATUS["last_error"] = repr(e)
+        print(f"[WARN] 데이터 리로드 실패 (이전 스냅샷 유지): {e!r}")
+    finally:
+        _RELOAD_QUEUED.release()
+
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    return {"status": "ok", "version": current_snapshot().version}
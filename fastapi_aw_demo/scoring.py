@@ -0,0 +1,74 @@
+# scoring.py
+"""고객 CLV/이탈 점수: 고객별 함수(_clv_naive/_churn)와 피처 테이블 전체 버전(score_clv/score_churn)
+
+데이터를 읽지 않는 순수 계산만 모아 둠 (app1은 import 때 엑셀을 읽으므로 따로 떼어 테스트 가능하게)
+"""
+import numpy as np
+import pandas as pd
+
+def _customer(feat, cid: int):
+    return feat.loc[cid] if cid in feat.index else None
+
+def _clv_naive(feat, stats, cid: int):
+    f = _customer(feat, cid)
+    hist = f["sales_sum"] if f is not None else 0.0
+    aov = (f["sales_mean"] if f is not None else stats["aov"]) or 0.0
+    n_orders = f["order_count"] if f is not None else 0
+    recent_days = f["days_since"] if f is not None else 365
+    if n_orders >= 10 and recent_days <= 60:
+        expected = 5
+    elif n_orders >= 5 and recent_days <= 120:
+        expected = 3
+    else:
+        expected = 1
+    clv = hist + expected * aov
+    return round(float(hist), 2), round(float(aov), 2), int(expected), round(float(clv), 2)
+
+def _churn(feat, cid: int):
+    f = _customer(feat, cid)
+    if f is None:
+        return 0.85, "high"
+    time_since = f["days_since"]
+    freq = f["order_count"]
+    ts_rank = min(1.0, time_since / 180)
+    freq_rank = 1.0 - min(1.0, freq / 10.0)
+    score = float(np.clip(0.6 * ts_rank + 0.4 * freq_rank, 0, 1))
+    label = "high" if score >= 0.66 else ("medium" if score >= 0.33 else "low")
+    return round(score, 3), label
+
+def _round_list(values, ndigits: int):
+    """파이썬 round(v, ndigits)와 같은 값의 리스트
+    np.round는 .5 경계 근처에서만 파이썬 round와 다를 수 있으므로 그 값만 파이썬 round로 다시 계산
+    """
+    a = np.asarray(values, dtype="float64")
+    out = np.round(a, ndigits)
+    scaled = a * 10.0 ** ndigits
+    edge = (np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6) | (np.abs(scaled) > 1e15)
+    for i in np.flatnonzero(edge):
+        out[i] = round(float(a[i]), ndigits)
+    return out.tolist()
+
+def score_clv(feat):
+    """_clv_naive의 전체 고객 버전: 피처 테이블(sales_sum, sales_mean, order_count, days_since) →
+    hist / aov / expected_orders / clv 열 (같은 반올림)
+    """
+    hist = feat["sales_sum"].astype("float64")
+    aov = feat["sales_mean"].astype("float64")
+    aov = aov.where(aov != 0, 0.0)
+    n_orders, recent = feat["order_count"], feat["days_since"]
+    expected = np.select([(n_orders >= 10) & (recent <= 60), (n_orders >= 5) & (recent <= 120)], [5, 3], 1)
+    clv = hist + expected * aov
+    return pd.DataFrame({
+        "hist": _round_list(hist, 2),
+        "aov": _round_list(aov, 2),
+        "expected_orders": expected,
+        "clv": _round_list(clv, 2),
+    }, index=feat.index)
+
+def score_churn(feat):
+    """_churn의 전체 고객 버전: 피처 테이블(days_since, order_count) → churn_score / churn_risk 열"""
+    ts_rank = np.minimum(1.0, feat["days_since"] / 180)
+    freq_rank = 1.0 - np.minimum(1.0, feat["order_count"] / 10.0)
+    score = np.clip(0.6 * ts_rank + 0.4 * freq_rank, 0, 1)
+    risk = np.select([score >= 0.66, score >= 0.33], ["high", "medium"], "low")
+    return pd.DataFrame({"churn_score": _round_list(score, 3), "churn_risk": risk}, index=feat.index, dtype=object)
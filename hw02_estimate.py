@@ -1,3 +1,6 @@
+import math
+
+import numpy as np
 from flask import Flask, request, jsonify
 
 app = Flask(__name__)
@@ -5,6 +8,9 @@ app = Flask(__name__)
 # 세율(10%)
 VAT_RATE = 0.10
 
+# 일괄 견적 한 번에 받을 수 있는 줄 수
+MAX_BATCH_LINES = 1000
+
 @app.post("/estimate")
 def estimate_price():
     """
@@ -52,6 +58,87 @@ def estimate_price():
         "total": total
     })
 
+def _parse_line(line):
+    """(price, quantity, error) - /estimate와 같은 검증 규칙"""
+    if not isinstance(line, dict):
+        return None, None, "각 줄은 {price, quantity} 객체여야 합니다."
+    if "price" not in line:
+        return None, None, "price(단가) 필수입니다."
+    try:
+        price = float(line["price"])
+    except (TypeError, ValueError):
+        return None, None, "price는 숫자여야 합니다."
+    if not math.isfinite(price):
+        return None, None, "price는 유한한 숫자여야 합니다."
+    try:
+        quantity = int(line.get("quantity", 1))
+    except (TypeError, ValueError):
+        return None, None, "quantity는 정수여야 합니다."
+    if quantity <= 0:
+        return None, None, "quantity는 1 이상이어야 합니다."
+    try:
+        float(quantity)
+    except OverflowError:
+        return None, None, "quantity가 너무 큽니다."
+    return price, quantity, None
+
+@app.post("/estimate/batch")
+def estimate_batch():
+    """
+    요청(JSON): 줄 목록 또는 {"lines": 줄 목록}
+      - 각 줄: {"price": 단가, "quantity": 수량(기본 1)}  (/estimate와 같은 규칙)
+
+    응답(JSON):
+      - lines: 줄마다 /estimate와 같은 필드(+ line 번호), 잘못된 줄은 {"line", "error"}
+      - order: 정상 줄 합계 (quantity, subtotal, vat, total = 각 줄 값의 합)
+      - errors: 잘못된 줄 수
+
+    세액/합계는 float64 배열로 한 번에 계산. np.rint는 파이썬 round와 같은 반올림(짝수 쪽)이라
+    줄마다 /estimate를 호출한 결과와 같은 값
+    """
+    data = request.get_json(silent=True)
+    lines = data.get("lines") if isinstance(data, dict) else data
+    if not isinstance(lines, list):
+        return jsonify({"error": "줄 목록(JSON 배열) 또는 {\"lines\": [...]}이 필요합니다."}), 400
+    if len(lines) > MAX_BATCH_LINES:
+        return jsonify({"error": f"한 번에 최대 {MAX_BATCH_LINES}줄까지 가능합니다."}), 400
+
+    # 검증 (한 번 훑기)
+    parsed = [_parse_line(line) for line in lines]
+    ok = [i for i, (_, _, err) in enumerate(parsed) if err is None]
+    price = np.array([parsed[i][0] for i in ok], dtype=np.float64)
+    quantity = np.array([float(parsed[i][1]) for i in ok], dtype=np.float64)
+
+    # 계산 (/estimate와 같은 순서의 float 연산)
+    with np.errstate(over="ignore", invalid="ignore"):
+        subtotal = price * quantity
+        vat = np.rint(subtotal * VAT_RATE)       # 원 단위 반올림
+        total = np.rint(subtotal + vat)
+    finite = np.isfinite(subtotal) & np.isfinite(vat) & np.isfinite(total)
+
+    out = [{"line": i, "error": err} for i, (_, _, err) in enumerate(parsed)]
+    order = {"lines": 0, "quantity": 0, "subtotal": 0, "vat_rate": VAT_RATE, "vat": 0, "total": 0}
+    cols = zip(ok, np.rint(price).tolist(), np.rint(subtotal).tolist(), vat.tolist(), total.tolist(), finite.tolist())
+    for i, unit, sub, v, tot, good in cols:
+        if not good:
+            out[i] = {"line": i, "error": "금액이 너무 큽니다."}
+            continue
+        row = {
+            "line": i,
+            "unit_price": int(unit),
+            "quantity": parsed[i][1],
+            "subtotal": int(sub),
+            "vat_rate": VAT_RATE,
+            "vat": int(v),
+            "total": int(tot),
+        }
+        out[i] = row
+        order["lines"] += 1
+        for key in ("quantity", "subtotal", "vat", "total"):
+            order[key] += row[key]
+
+    return jsonify({"lines": out, "order": order, "errors": len(lines) - order["lines"]})
+
 if __name__ == "__main__":
     # 개발 실행용
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -3,11 +3,12 @@
 """
 Timetable Auto-Assignment (Final Project) - A안 (학점=주당시수)
 
-- 입력: courses_data.csv (교수님 별첨 파일 그대로 사용)
+- 입력: courses_data.csv (교수님 별첨 파일 그대로 사용, .parquet/.feather도 가능)
         rooms.csv (없으면 1215/1216/1217/1418 기본 생성)
 - 규칙: 1시간 블록(09:00-21:00), 월-금
        실습 과목은 lab 전용(1217/1418), 강의 과목은 lecture 전용(1215/1216)
        수용인원(capacity)은 무시 (옵션 --respect-capacity로 활성화 가능)
+       같은 교수(강좌담당교수), 같은 학과-학년(개설학과+개설학년)은 동시간대 중복 배정 금지
        강의실 부족하면 외부대여-타강의실1 1개만 자동 추가
 - 산출물: assigned_schedule.csv, vacant_slots.csv, calendar_google_import.csv, utilization.png
 
@@ -21,24 +22,81 @@ Timetable Auto-Assignment (Final Project) - A안 (학점=주당시수)
   --start-hour            : 하루 시작 시각 (기본 9)
   --end-hour              : 하루 종료 시각(종료 시간 자체는 포함 안 됨, 기본 21)
   --respect-capacity      : rooms.csv의 capacity를 수강인원과 비교하여 초과 시 배정 금지
+  --allow-instructor-overlap : 같은 교수의 동시간대 중복 배정 허용
+  --allow-cohort-overlap  : 같은 학과-학년의 동시간대 중복 배정 허용
+  --solver search         : 제약 전파 + 백트래킹 탐색 (실패 시 종료 대신 부분 배정 + unplaced_hours.csv 저장)
+  --time-limit            : search 모드 시도당 시간 제한(초, 기본 10)
+  --slot-minutes 30       : 30분 블록 사용 (1시간 = 2블록, 같은 강의실 연속 배치; --solver search와는 함께 못 씀)
+  --block-mode            : greedy 연속 배치 단위 — hourly(기본, 1시간씩) / split(3h → 2+1) / single(3h 연속)
+                            split/single은 같은 과목 블록을 서로 다른 요일에 우선 배치
+  --restarts K --workers N --seed S : greedy 순서를 섞어 K번 시도(N개 프로세스)하고
+                            가동률 편차/교수 공강/외부대여 점수가 가장 낮은 결과 선택
+  --incremental           : 기존 assigned_schedule.csv(--base-schedule)를 유지하고
+                            courses CSV에서 추가/삭제/변경된 과목(교과목코드+분반)만 재배치
+                            (분반 열이 없으면 같은 교과목코드 안에서 과목 내용 → 교수·학과-학년 순으로 기존 분반과 맞춤)
 """
 import argparse
+import codecs
+import heapq
+import random
 import sys
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from collections import namedtuple
 
 import pandas as pd
 import matplotlib.pyplot as plt
 
-def read_csv_auto(path):
+ENCODINGS = ("utf-8", "cp949", "euc-kr")
+COLUMNAR_EXTS = (".parquet", ".pq", ".feather", ".arrow")
+COURSE_COLUMNS = ["교과목코드","교과목명","강좌담당교수","수강인원","교과목학점","강의유형구분","개설학과","개설학년","분반"]
+OPTIONAL_COURSE_COLUMNS = ("개설학년", "분반")
+# 코드/이름/학년 등은 문자열 그대로 읽음 (chunk마다 dtype 추론이 달라 7432 ↔ 7432.0, 1 ↔ 1.0이 섞이지 않게)
+COURSE_TEXT_COLUMNS = ["교과목코드","교과목명","강좌담당교수","강의유형구분","개설학과","개설학년"]
+
+def sniff_encoding(path, nbytes=64 * 1024):
+    """파일 앞부분(nbytes)만 디코딩해 인코딩 추정 (끝에서 잘린 멀티바이트 문자는 허용)"""
+    with open(path, "rb") as f:
+        head = f.read(nbytes)
+    for enc in ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return None
+
+def read_table(path, columns=None):
+    """Parquet/Feather(Arrow IPC) 입력: 필요한 열만 읽고, 없는 열은 건너뜀"""
+    reader = pd.read_parquet if path.lower().endswith((".parquet", ".pq")) else pd.read_feather
+    try:
+        return reader(path, columns=columns)
+    except (KeyError, ValueError):
+        df = reader(path)
+        return df[[c for c in columns if c in df.columns]] if columns else df
+
+def read_csv_auto(path, usecols=None, chunksize=None, dtype=None):
+    """CSV(utf-8/cp949/euc-kr) 또는 Parquet/Feather 읽기
+
+    - usecols: 필요한 열 이름 목록 (없는 열은 무시)
+    - chunksize: 지정하면 DataFrame 대신 chunk 반복자 반환 (CSV만)
+    - dtype: CSV 열 dtype 지정 (read_csv와 같음, Parquet/Feather는 파일의 dtype 사용)
+    """
+    if str(path).lower().endswith(COLUMNAR_EXTS):
+        df = read_table(str(path), columns=usecols)
+        return iter([df]) if chunksize else df
+    cols = (lambda c: c in usecols) if usecols else None
+    sniffed = sniff_encoding(path)
+    encs = [sniffed] + [e for e in ENCODINGS if e != sniffed] if sniffed else list(ENCODINGS)
     last_err = None
-    for enc in ("utf-8", "cp949", "euc-kr"):
+    for enc in encs:
         try:
-            return pd.read_csv(path, encoding=enc)
+            return pd.read_csv(path, encoding=enc, usecols=cols, chunksize=chunksize, dtype=dtype)
         except Exception as e:
             last_err = e
-    raise RuntimeError(f"CSV 읽기 실패: {path} (encodings tried: utf-8, cp949, euc-kr)\n{last_err}")
+    raise RuntimeError(f"CSV 읽기 실패: {path} (encodings tried: {', '.join(encs)})\n{last_err}")
 
 def ensure_rooms_csv(path):
     if not os.path.exists(path):
@@ -52,155 +110,894 @@ def ensure_rooms_csv(path):
         print(f"[INFO] rooms.csv 생성: {path}")
     return read_csv_auto(path)
 
-def requires_lab_flag(kind: str) -> str:
-    kind = str(kind).strip()
-    return "Y" if "실습" in kind else "N"
-
-def build_courses_frame(df_courses_raw, department_filter=None):
+def _courses_chunk(df, department_filter=None):
     # 필수 컬럼 확인
-    need = ["교과목코드","교과목명","강좌담당교수","수강인원","교과목학점","강의유형구분","개설학과"]
+    need = [c for c in COURSE_COLUMNS if c not in OPTIONAL_COURSE_COLUMNS]
     for col in need:
-        if col not in df_courses_raw.columns:
+        if col not in df.columns:
             raise RuntimeError(f"필수 열 누락: {col}")
 
-    df = df_courses_raw.copy()
-
     if department_filter:
-        mask = df["개설학과"].astype(str).str.contains(department_filter, na=False)
-        df = df[mask].copy()
-        if df.empty:
-            raise RuntimeError(f"'{department_filter}' 필터 결과가 없습니다. --department-filter 값을 확인하세요.")
+        mask = df["개설학과"].astype(str).str.contains(department_filter, na=False, regex=False)
+        df = df[mask]
+
+    def text(col):
+        # str(x).strip()과 같은 결과 (결측은 "nan")
+        return df[col].astype(str).fillna("nan").str.strip()
+
+    # 학점이 비정상일 경우 0으로
+    hours = pd.to_numeric(df["교과목학점"], errors="coerce").fillna(0).astype(int)
+    enrollment = pd.to_numeric(df["수강인원"], errors="coerce").fillna(0).astype(int)
+    lab = df["강의유형구분"].astype(str).str.contains("실습", na=False, regex=False)
+    # 같은 학과·학년 수강생 집단 (개설학년이 없으면 빈 문자열 → 충돌 검사 제외)
+    if "개설학년" in df.columns:
+        grade = df["개설학년"].astype(str).fillna("").str.strip()
+        grade = grade.where(df["개설학년"].notna(), "")
+        cohort = (text("개설학과") + "-" + grade).where(grade != "", "")
+    else:
+        cohort = ""
+    out = pd.DataFrame({
+        "course_id": text("교과목코드"),
+        "name": text("교과목명"),
+        "hours_per_week": hours,        # A안: 학점=주당시수
+        "instructor": text("강좌담당교수"),
+        "requires_lab": lab.map({True: "Y", False: "N"}),
+        "enrollment": enrollment,
+        "priority": 1,
+        "cohort": cohort,
+    })
+    if "분반" in df.columns:
+        out["section"] = pd.to_numeric(df["분반"], errors="coerce")
+    return out.reset_index(drop=True)
+
+def _finish_courses(out, department_filter=None):
+    if department_filter and out.empty:
+        raise RuntimeError(f"'{department_filter}' 필터 결과가 없습니다. --department-filter 값을 확인하세요.")
+    if out.empty:
+        return out
+    order = out.groupby("course_id").cumcount() + 1
+    if "section" in out.columns:
+        # 분반 열이 있으면 그대로 사용 (비어 있는 행만 등장 순서로 채움)
+        out["section"] = out["section"].fillna(order).astype(int)
+        out.attrs["explicit_section"] = True
+    else:
+        # 같은 교과목코드의 분반: CSV 등장 순서대로 1, 2, ... (증분 모드에서는 diff가 내용으로 다시 맞춤)
+        out["section"] = order
+    return out
+
+def build_courses_frame(df_courses_raw, department_filter=None):
+    return _finish_courses(_courses_chunk(df_courses_raw, department_filter), department_filter)
+
+def load_courses(path, department_filter=None, chunksize=100_000):
+    """과목 파일(CSV/Parquet/Feather) → build_courses_frame 결과
+    필요한 열만, CSV는 chunksize 행씩 읽어 바로 변환하므로 원본 전체를 메모리에 올리지 않는다"""
+    parts = [_courses_chunk(chunk, department_filter)
+             for chunk in read_csv_auto(path, usecols=COURSE_COLUMNS, chunksize=chunksize,
+                                        dtype={c: str for c in COURSE_TEXT_COLUMNS})]
+    out = pd.concat(parts, ignore_index=True) if parts else _courses_chunk(pd.DataFrame(columns=COURSE_COLUMNS))
+    return _finish_courses(out, department_filter)
 
-    rows = []
-    for _, r in df.iterrows():
+DAYS = ["Mon","Tue","Wed","Thu","Fri"]
+Slot = namedtuple("Slot", ["day","start","end"])
+
+def build_grid(start_hour, end_hour, slot_minutes=60):
+    """요일 우선(Mon 09:00, Mon 10:00, ..., Fri 20:00) 순서의 시간 블록 목록 (slot_minutes 단위)"""
+    def hhmm(m):
+        return f"{m // 60:02d}:{m % 60:02d}"
+    HOURS = [(m, hhmm(m), hhmm(m + slot_minutes))
+             for m in range(start_hour * 60, end_hour * 60, slot_minutes)]
+    return [Slot(d, s, e) for d in DAYS for (_, s, e) in HOURS]
+
+def slots_needed(hours, slot_minutes=60):
+    # 주당 시수 → 필요한 블록 수 (30분 단위면 1시간 = 2블록)
+    return max(0, -(-int(hours) * 60 // slot_minutes))
+
+def block_pattern(hours, mode="hourly"):
+    """주당 시수를 연속 수업 묶음(시간 단위)으로 나눔
+    - hourly: 1시간씩 (기존 방식, 같은 요일 여러 번 가능)
+    - split : 2시간 묶음 + 나머지 (3h → 2+1, 4h → 2+2)
+    - single: 한 번에 연속 (3h → 3)
+    """
+    hours = max(0, int(hours))
+    if hours == 0:
+        return []
+    if mode == "single":
+        return [hours]
+    if mode == "split":
+        return [2] * (hours // 2) + [1] * (hours % 2)
+    return [1] * hours
+
+def room_ok(room, course, respect_capacity):
+    # 실습 요구 시 lab만
+    if course["requires_lab"]=="Y" and str(room["room_type"]).lower()!="lab":
+        return False
+    if respect_capacity:
         try:
-            hours = int(pd.to_numeric(r["교과목학점"], errors="raise"))
+            if int(room.get("capacity", 9999)) < int(course.get("enrollment", 0)):
+                return False
         except Exception:
-            # 학점이 비정상일 경우 0으로
-            hours = 0
-        rows.append({
-            "course_id": str(r["교과목코드"]).strip(),
-            "name": str(r["교과목명"]).strip(),
-            "hours_per_week": hours,        # A안: 학점=주당시수
-            "instructor": str(r["강좌담당교수"]).strip(),
-            "requires_lab": requires_lab_flag(r["강의유형구분"]),
-            "enrollment": int(pd.to_numeric(r["수강인원"], errors="coerce")) if pd.notna(r["수강인원"]) else 0,
-            "priority": 1,
-        })
-    return pd.DataFrame(rows)
-
-def try_schedule(rooms, courses, start_hour, end_hour, respect_capacity):
-    DAYS = ["Mon","Tue","Wed","Thu","Fri"]
-    HOURS = [(h, f"{h:02d}:00", f"{(h+1):02d}:00") for h in range(start_hour, end_hour)]
-    Slot = namedtuple("Slot", ["day","start","end"])
-    GRID = [Slot(d, s, e) for d in DAYS for (_, s, e) in HOURS]
+            pass
+    return True
+
+class RoomAvailability:
+    """강의실 × 시간 블록 가용성 엔진 (정수 코드 + 비트마스크)
+
+    - 강의실은 rooms 순서대로 0..R-1, 슬롯은 GRID 순서대로 0..S-1 정수로 코딩
+    - by_slot[s]: 슬롯 s에서 비어있는 강의실 비트마스크 (bit r = 강의실 r)
+    - by_room[r]: 강의실 r의 빈 슬롯 비트마스크 (bit s = 슬롯 s)
+    - 과목 유형(실습 여부, 수강인원)별 배정 가능 강의실 마스크는 한 번만 계산해 캐시
+    """
+    def __init__(self, rooms, grid, respect_capacity=False):
+        self.rooms = list(rooms)
+        self.grid = list(grid)
+        self.respect_capacity = respect_capacity
+        self.by_slot = [(1 << len(self.rooms)) - 1] * len(self.grid)
+        self.by_room = [(1 << len(self.grid)) - 1] * len(self.rooms)
+        self.slots_per_day = len(self.grid) // len(DAYS) if self.grid else 0
+        self._eligible = {}
+        self._runs = {}
+
+    def eligible_mask(self, course):
+        key = (course["requires_lab"], course.get("enrollment", 0) if self.respect_capacity else None)
+        mask = self._eligible.get(key)
+        if mask is None:
+            mask = 0
+            for ri, r in enumerate(self.rooms):
+                if room_ok(r, course, self.respect_capacity):
+                    mask |= 1 << ri
+            self._eligible[key] = mask
+        return mask
+
+    def is_free(self, ri, si):
+        return (self.by_slot[si] >> ri) & 1 == 1
+
+    def first_free_room(self, si, eligible):
+        # rooms 순서상 가장 앞의 빈 강의실 (없으면 -1)
+        m = self.by_slot[si] & eligible
+        if not m:
+            return -1
+        return (m & -m).bit_length() - 1
+
+    def occupy(self, ri, si):
+        self.by_slot[si] &= ~(1 << ri)
+        self.by_room[ri] &= ~(1 << si)
+        self._refresh_runs(ri)
+
+    def release(self, ri, si):
+        self.by_slot[si] |= 1 << ri
+        self.by_room[ri] |= 1 << si
+        self._refresh_runs(ri)
+
+    # ---- 연속 빈 구간(free-run) 인덱스 ----
+    # _runs[k] = (valid, starts): starts[r]는 강의실 r에서 길이 k 연속 빈 블록을 시작할 수 있는
+    # 슬롯 비트마스크(요일 경계를 넘지 않음). 처음 조회한 k만 만들고, 점유/해제 시 그 강의실만 갱신
+    def _run_starts(self, free, k, valid):
+        m = free
+        for j in range(1, k):
+            m &= free >> j
+        return m & valid
+
+    def _refresh_runs(self, ri):
+        for k, (valid, starts) in self._runs.items():
+            starts[ri] = self._run_starts(self.by_room[ri], k, valid)
+
+    def runs(self, k):
+        if k not in self._runs:
+            valid = 0
+            for si in range(len(self.grid)):
+                if si % self.slots_per_day + k <= self.slots_per_day:
+                    valid |= 1 << si
+            self._runs[k] = (valid, [self._run_starts(free, k, valid) for free in self.by_room])
+        return self._runs[k][1]
+
+    def find_run(self, k, eligible, blocked=0):
+        """길이 k 연속 빈 블록 중 가장 이른 시작 슬롯(같으면 rooms 순서 앞) → (slot, room) 또는 None
+        blocked: 시작할 수 없는 슬롯 비트마스크"""
+        starts = self.runs(k)
+        best = None
+        m = eligible
+        while m:
+            low = m & -m
+            ri = low.bit_length() - 1
+            m ^= low
+            cand = starts[ri] & ~blocked
+            if cand:
+                si = (cand & -cand).bit_length() - 1
+                if best is None or si < best[0]:
+                    best = (si, ri)
+        return best
+
+class OccupancyIndex:
+    """엔티티(교수, 학과-학년 등)별 사용 중인 슬롯 비트마스크 — 충돌 검사 O(1)"""
+    def __init__(self):
+        self.busy = {}
+
+    @staticmethod
+    def _skip(key):
+        return key is None or str(key).strip() in ("", "nan")
+
+    def mask(self, key):
+        if self._skip(key):
+            return 0
+        return self.busy.get(key, 0)
+
+    def is_free(self, key, si):
+        return (self.mask(key) >> si) & 1 == 0
+
+    def occupy(self, key, si):
+        if not self._skip(key):
+            self.busy[key] = self.busy.get(key, 0) | (1 << si)
+
+    def release(self, key, si):
+        if not self._skip(key):
+            self.busy[key] = self.busy.get(key, 0) & ~(1 << si)
+
+def make_assignment(course, room, slot, hours=1):
+    return {
+        "course_id": course["course_id"],
+        "name": course["name"],
+        "instructor": course["instructor"],
+        "enrollment": course["enrollment"],
+        "requires_lab": course["requires_lab"],
+        "room_id": room["room_id"],
+        "room_type": room["room_type"],
+        "day": slot.day,
+        "start": slot.start,
+        "end": slot.end,
+        "hours": hours,
+        "cohort": course.get("cohort", ""),
+        "section": course.get("section", 1),
+    }
+
+BORROWED_ROOM = {"room_id":"외부대여-타강의실1","room_type":"lecture","capacity":999999}
+
+def course_order_key(c):
+    # sort courses: priority asc, hours desc, lab first
+    return (c["priority"], -c["hours_per_week"], -(1 if c["requires_lab"]=="Y" else 0))
+
+def perturbed_order(courses_sorted, seed):
+    """같은 정렬키 안에서 순서를 섞고, 이웃한 과목 몇 쌍을 맞바꿔 다른 그리디 순서를 만든다 (seed 고정 시 재현 가능)"""
+    rng = random.Random(seed)
+    out = list(courses_sorted)
+    rng.shuffle(out)
+    out.sort(key=course_order_key)
+    for _ in range(len(out) // 10):
+        i = rng.randrange(len(out) - 1)
+        out[i], out[i + 1] = out[i + 1], out[i]
+    return out
+
+def try_schedule(rooms, courses, start_hour, end_hour, respect_capacity,
+                 check_instructor=True, check_cohort=True, slot_minutes=60, block_mode="hourly",
+                 order_seed=None):
+    GRID = build_grid(start_hour, end_hour, slot_minutes)
 
     # build availability
-    avail = {(r["room_id"], sl.day, sl.start): True for r in rooms for sl in GRID}
+    avail = RoomAvailability(rooms, GRID, respect_capacity=respect_capacity)
+    # 교수/학과-학년 중복 수업 방지용 점유 인덱스
+    by_instructor = OccupancyIndex()
+    by_cohort = OccupancyIndex()
     assigns = []
 
-    # sort courses: priority asc, hours desc, lab first
-    courses_sorted = sorted(
-        courses,
-        key=lambda c: (c["priority"], -c["hours_per_week"], -(1 if c["requires_lab"]=="Y" else 0))
-    )
-
-    def room_ok(room, course):
-        # 실습 요구 시 lab만
-        if course["requires_lab"]=="Y" and str(room["room_type"]).lower()!="lab":
-            return False
-        if respect_capacity:
-            try:
-                if int(room.get("capacity", 9999)) < int(course.get("enrollment", 0)):
-                    return False
-            except Exception:
-                pass
-        return True
+    courses_sorted = sorted(courses, key=course_order_key)
+    if order_seed is not None:
+        courses_sorted = perturbed_order(courses_sorted, order_seed)
+
+    if block_mode != "hourly" or slot_minutes != 60:
+        return place_blocks(avail, by_instructor, by_cohort, courses_sorted, slot_minutes, block_mode,
+                            check_instructor, check_cohort), GRID
 
     for c in courses_sorted:
         hours_needed = int(c["hours_per_week"])
+        eligible = avail.eligible_mask(c)
         got = 0
-        # day-major iteration
-        for d in ["Mon","Tue","Wed","Thu","Fri"]:
+        # day-major iteration (GRID 순서), 슬롯당 최대 1시간
+        for si, sl in enumerate(GRID):
             if got >= hours_needed:
                 break
-            for (_, s, e) in HOURS:
-                if got >= hours_needed:
-                    break
-                # search rooms
-                for r in rooms:
-                    if not room_ok(r, c):
-                        continue
-                    if avail[(r["room_id"], d, s)]:
-                        avail[(r["room_id"], d, s)] = False
-                        assigns.append({
-                            "course_id": c["course_id"],
-                            "name": c["name"],
-                            "instructor": c["instructor"],
-                            "enrollment": c["enrollment"],
-                            "requires_lab": c["requires_lab"],
-                            "room_id": r["room_id"],
-                            "room_type": r["room_type"],
-                            "day": d,
-                            "start": s,
-                            "end": e,
-                            "hours": 1
-                        })
-                        got += 1
-                        break
+            if check_instructor and not by_instructor.is_free(c["instructor"], si):
+                continue
+            if check_cohort and not by_cohort.is_free(c.get("cohort"), si):
+                continue
+            ri = avail.first_free_room(si, eligible)
+            if ri < 0:
+                continue
+            avail.occupy(ri, si)
+            by_instructor.occupy(c["instructor"], si)
+            by_cohort.occupy(c.get("cohort"), si)
+            assigns.append(make_assignment(c, rooms[ri], sl))
+            got += 1
         if got < hours_needed:
             return None, GRID  # fail
 
     return assigns, GRID
 
-def export_outputs(assignments, GRID, rooms, anchor_date, out_dir):
+def place_blocks(avail, by_instructor, by_cohort, courses_sorted, slot_minutes, block_mode,
+                 check_instructor=True, check_cohort=True):
+    """과목을 연속 블록(block_pattern) 단위로 배치. 하나라도 실패하면 None
+
+    - 블록 길이 k(슬롯 수)의 후보는 free-run 인덱스로 조회 (강의실별 비트마스크 AND)
+    - 교수/학과-학년이 바쁜 슬롯을 덮는 시작점은 blocked 마스크로 한 번에 제외
+    - split/single 모드는 같은 과목의 블록을 서로 다른 요일에 우선 배치
+    """
+    GRID = avail.grid
+    spd = avail.slots_per_day
+    spm = 60 / slot_minutes
+    day_masks = [((1 << spd) - 1) << (d * spd) for d in range(len(DAYS))]
+    assigns = []
+    for c in courses_sorted:
+        eligible = avail.eligible_mask(c)
+        own = 0
+        used_days = 0
+        for bh in sorted(block_pattern(c["hours_per_week"], block_mode), reverse=True):
+            k = slots_needed(bh, slot_minutes)
+            busy = own
+            if check_instructor:
+                busy |= by_instructor.mask(c["instructor"])
+            if check_cohort:
+                busy |= by_cohort.mask(c.get("cohort"))
+            blocked = 0
+            for j in range(k):
+                blocked |= busy >> j
+            hit = None
+            if block_mode != "hourly":
+                day_block = 0
+                for d, dm in enumerate(day_masks):
+                    if (used_days >> d) & 1:
+                        day_block |= dm
+                hit = avail.find_run(k, eligible, blocked | day_block)
+            if hit is None:
+                hit = avail.find_run(k, eligible, blocked)
+            if hit is None:
+                return None  # fail
+            si, ri = hit
+            for sj in range(si, si + k):
+                avail.occupy(ri, sj)
+                by_instructor.occupy(c["instructor"], sj)
+                by_cohort.occupy(c.get("cohort"), sj)
+                own |= 1 << sj
+                assigns.append(make_assignment(c, avail.rooms[ri], GRID[sj], hours=1 / spm if spm != 1 else 1))
+            used_days |= 1 << (si // spd)
+    return assigns
+
+SCORE_WEIGHTS = {"util_std": 10.0, "instructor_gap_hours": 1.0, "borrowed_rooms": 100.0}
+
+def score_schedule(assigns, rooms, GRID, borrowed_rooms=0):
+    """배정 결과 품질 점수 (낮을수록 좋음)
+    - util_std: 강의실 가동률 표준편차 (고르게 쓸수록 작음)
+    - instructor_gap_hours: 교수별·요일별 첫 수업~마지막 수업 사이 공강 시간 합
+    - borrowed_rooms: 외부 대여 강의실 수
+    """
+    df = pd.DataFrame(assigns)
+    room_ids = [str(r["room_id"]) for r in rooms]
+    if df.empty:
+        used = pd.Series(0.0, index=room_ids)
+        gaps = 0.0
+    else:
+        used = df.assign(room_id=df["room_id"].astype(str)).groupby("room_id").size().reindex(room_ids, fill_value=0)
+        slot_idx = {(sl.day, sl.start): si for si, sl in enumerate(GRID)}
+        df["si"] = [slot_idx[k] for k in zip(df["day"], df["start"])]
+        g = df.groupby(["instructor", "day"])["si"].agg(["min", "max", "nunique"])
+        slot_hours = float(df["hours"].iloc[0])
+        gaps = float(((g["max"] - g["min"] + 1) - g["nunique"]).sum()) * slot_hours
+    util_std = float((used / max(1, len(GRID))).std(ddof=0)) if len(used) else 0.0
+    parts = {"util_std": round(util_std, 4), "instructor_gap_hours": gaps, "borrowed_rooms": borrowed_rooms}
+    parts["score"] = round(sum(SCORE_WEIGHTS[k] * v for k, v in parts.items()), 4)
+    return parts
+
+def _run_restart(job):
+    # ProcessPoolExecutor 작업 단위 (pickle 가능하도록 모듈 최상위 함수)
+    k, rooms, borrowed, courses, start_hour, end_hour, opts = job
+    seed = opts.pop("order_seed")
+    assigns, GRID = try_schedule(rooms, courses, start_hour, end_hour, order_seed=seed, **opts)
+    used_borrowed = False
+    if assigns is None:
+        assigns, GRID = try_schedule(rooms + [borrowed], courses, start_hour, end_hour, order_seed=seed, **opts)
+        used_borrowed = assigns is not None
+    if assigns is None:
+        return k, None, used_borrowed, None
+    score = score_schedule(assigns, rooms + ([borrowed] if used_borrowed else []), GRID, int(used_borrowed))
+    return k, assigns, used_borrowed, score
+
+def multi_start_schedule(rooms, courses, start_hour, end_hour, borrowed, restarts=1, workers=1, seed=0, **opts):
+    """서로 다른 과목 순서로 try_schedule을 restarts번 돌려 score가 가장 낮은 결과를 고름
+
+    - 0번 시도는 기존 순서 그대로, k번 시도는 seed + k로 perturbed_order
+    - workers > 1이면 ProcessPoolExecutor로 병렬 실행
+    - 동점이면 시도 번호가 작은 쪽 → 완료 순서와 무관하게 seed만으로 결과가 정해짐
+    반환: (assigns, GRID, used_borrowed, score) — 모두 실패하면 assigns는 None
+    """
+    jobs = [(k, rooms, borrowed, courses, start_hour, end_hour,
+             dict(opts, order_seed=None if k == 0 else seed + k)) for k in range(max(1, restarts))]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_run_restart, jobs))
+    else:
+        results = [_run_restart(j) for j in jobs]
+    ok = [r for r in results if r[1] is not None]
+    GRID = build_grid(start_hour, end_hour, opts.get("slot_minutes", 60))
+    if not ok:
+        return None, GRID, False, None
+    k, assigns, used_borrowed, score = min(ok, key=lambda r: (r[3]["score"], r[0]))
+    print(f"[INFO] multi-start: {len(ok)}/{len(results)} 성공, 최적 시도 #{k} score={score['score']} {score}")
+    return assigns, GRID, used_borrowed, score
+
+def search_schedule(rooms, courses, start_hour, end_hour, respect_capacity,
+                    check_instructor=True, check_cohort=True, time_limit=10.0, slot_minutes=60):
+    """제약 전파 + 백트래킹 탐색 (--solver search)
+
+    - 변수: 과목의 1시간 블록, 값: 슬롯 (강의실은 가장 덜 경쟁적인 빈 강의실을 선택)
+    - 과목 선택: slack(남은 후보 슬롯 수 - 남은 시수)이 가장 작은 과목 먼저 (MRV)
+    - 전방 검사: 배치로 영향을 받는 과목(같은 교수/학과-학년/강의실 유형)의 slack이 음수면 즉시 되돌림
+    - 같은 과목의 시수는 슬롯 오름차순으로만 배치 (대칭 제거)
+    - time_limit 초 안에 완성하지 못하면 가장 많이 배치한 부분해 + 그리디 보충 결과를 반환
+    - 블록을 하나씩 따로 배치하므로 1시간 블록(slot_minutes=60)만 지원 (30분 블록이면 한 시간이 쪼개짐)
+
+    반환: (assigns, GRID, unplaced) — unplaced는 과목별 미배정 시수 목록(완성 시 빈 리스트)
+    """
+    if slot_minutes != 60:
+        raise RuntimeError("--solver search는 1시간 블록만 지원합니다 (--slot-minutes 60)")
+    GRID = build_grid(start_hour, end_hour, slot_minutes)
+    full = (1 << len(GRID)) - 1
+    deadline = time.perf_counter() + time_limit
+
+    avail = RoomAvailability(rooms, GRID, respect_capacity=respect_capacity)
+    by_instructor = OccupancyIndex()
+    by_cohort = OccupancyIndex()
+
+    n = len(courses)
+    need = [slots_needed(c["hours_per_week"], slot_minutes) for c in courses]
+    elig = [avail.eligible_mask(c) for c in courses]
+    inst = [c["instructor"] if check_instructor else None for c in courses]
+    coh = [c.get("cohort") if check_cohort else None for c in courses]
+
+    # 강의실 유형(배정 가능 강의실 마스크)별 "빈 강의실이 남은 슬롯" 마스크
+    classes = sorted(set(elig))
+    cls_of = [classes.index(m) for m in elig]
+    open_slots = [full if m else 0 for m in classes]
+    members = [[] for _ in classes]
+    inst_members, coh_members = {}, {}
+    for i in range(n):
+        members[cls_of[i]].append(i)
+        if not OccupancyIndex._skip(inst[i]):
+            inst_members.setdefault(inst[i], []).append(i)
+        if not OccupancyIndex._skip(coh[i]):
+            coh_members.setdefault(coh[i], []).append(i)
+
+    # 강의실 경쟁도: 그 강의실을 쓸 수 있는 과목들의 총 시수 (작을수록 먼저 사용)
+    room_demand = [sum(need[i] for i in range(n) if (elig[i] >> ri) & 1) for ri in range(len(avail.rooms))]
+
+    remaining = need[:]
+    own = [0] * n  # 과목별 배치된 슬롯 마스크
+    nxt = [0] * n  # 다음 시수는 nxt[i] 이상 슬롯에만
+    trail = []     # (course, slot, room, closed_classes, prev_nxt)
+
+    def domain(i):
+        return (open_slots[cls_of[i]]
+                & ~by_instructor.mask(inst[i])
+                & ~by_cohort.mask(coh[i])
+                & (full >> nxt[i] << nxt[i]))
+
+    def slack(i):
+        return domain(i).bit_count() - remaining[i]
+
+    def place(i, si, ri=None):
+        if ri is None:
+            m = avail.by_slot[si] & elig[i]
+            ri = min((r for r in range(m.bit_length()) if (m >> r) & 1), key=lambda r: (room_demand[r], r))
+        avail.occupy(ri, si)
+        by_instructor.occupy(inst[i], si)
+        by_cohort.occupy(coh[i], si)
+        closed = []
+        for k, m in enumerate(classes):
+            if (open_slots[k] >> si) & 1 and not (avail.by_slot[si] & m):
+                open_slots[k] &= ~(1 << si)
+                closed.append(k)
+        trail.append((i, si, ri, closed, nxt[i]))
+        own[i] |= 1 << si
+        nxt[i] = si + 1
+        remaining[i] -= 1
+        return closed
+
+    def unplace():
+        i, si, ri, closed, prev_nxt = trail.pop()
+        avail.release(ri, si)
+        by_instructor.release(inst[i], si)
+        by_cohort.release(coh[i], si)
+        for k in closed:
+            open_slots[k] |= 1 << si
+        own[i] &= ~(1 << si)
+        nxt[i] = prev_nxt
+        remaining[i] += 1
+        return i, closed
+
+    def affected(i, closed):
+        out = {i}
+        out.update(inst_members.get(inst[i], ()))
+        out.update(coh_members.get(coh[i], ()))
+        for k in closed:
+            out.update(members[k])
+        return [j for j in out if j not in hopeless]
+
+    heap, ver = [], [0] * n
+
+    def push(j):
+        ver[j] += 1
+        if remaining[j] > 0:
+            heapq.heappush(heap, (slack(j), -remaining[j], j, ver[j]))
+
+    def select():
+        while heap:
+            _, _, j, v = heapq.heappop(heap)
+            if v == ver[j] and remaining[j] > 0:
+                return j
+        return None
+
+    def values(j):
+        # 빈 강의실이 많은 슬롯 먼저 (다른 과목의 선택지를 덜 줄이는 값 우선)
+        d = domain(j)
+        cand = [si for si in range(d.bit_length()) if (d >> si) & 1]
+        return sorted(cand, key=lambda si: (-(avail.by_slot[si] & elig[j]).bit_count(), si))
+
+    # 처음부터 시수를 채울 수 없는 과목은 탐색에서 제외하고 마지막 보충 단계에서 처리
+    hopeless = {i for i in range(n) if need[i] > 0 and slack(i) < 0}
+    for i in range(n):
+        if i not in hopeless:
+            push(i)
+
+    best = []
+    stack = []
+    j = select()
+    solved = j is None
+    if not solved:
+        stack.append([j, values(j), 0])
+    while stack:
+        if time.perf_counter() > deadline:
+            break
+        frame = stack[-1]
+        if len(trail) >= len(stack):
+            # 자식 실패로 복귀: 현재 배치를 기록 후 되돌리고 다음 값 시도
+            if len(trail) > len(best):
+                best = [t[:3] for t in trail]
+            for k in affected(*unplace()):
+                push(k)
+        j, vals = frame[0], frame[1]
+        placed = False
+        while frame[2] < len(vals):
+            si = vals[frame[2]]
+            frame[2] += 1
+            closed = place(i=j, si=si)
+            touched = affected(j, closed)
+            if all(remaining[k] == 0 or slack(k) >= 0 for k in touched):
+                for k in touched:
+                    push(k)
+                placed = True
+                break
+            unplace()
+        if not placed:
+            push(j)
+            stack.pop()
+            continue
+        nj = select()
+        if nj is None:
+            solved = True
+            break
+        stack.append([nj, values(nj), 0])
+
+    if not solved and len(best) > len(trail):
+        while trail:
+            unplace()
+        for i, si, ri in best:
+            place(i, si, ri)
+
+    # 보충: 남은 시수를 GRID 순서로 그리디 배치
+    for i in range(n):
+        for si in range(len(GRID)):
+            if remaining[i] <= 0:
+                break
+            if ((by_instructor.mask(inst[i]) | by_cohort.mask(coh[i]) | own[i]) >> si) & 1:
+                continue
+            if avail.first_free_room(si, elig[i]) < 0:
+                continue
+            place(i, si)
+
+    slot_hours = 1 if slot_minutes == 60 else slot_minutes / 60
+    assigns = [make_assignment(courses[i], avail.rooms[ri], GRID[si], slot_hours) for i, si, ri, _, _ in trail]
+    unplaced = [{
+        "course_id": courses[i]["course_id"],
+        "name": courses[i]["name"],
+        "instructor": courses[i]["instructor"],
+        "requires_lab": courses[i]["requires_lab"],
+        "hours": remaining[i] * slot_minutes / 60 if slot_minutes != 60 else remaining[i],
+    } for i in range(n) if remaining[i] > 0]
+    return assigns, GRID, unplaced
+
+COURSE_FIELDS = ["name", "instructor", "enrollment", "requires_lab", "cohort", "hours_per_week"]
+
+def course_key(course):
+    return (str(course["course_id"]), int(course.get("section", 1)))
+
+class ScheduleState:
+    """기존 배정 결과를 현재 상태로 두고, 바뀐 과목의 시수만 다시 배치 (증분 모드)
+
+    - placed[(course_id, section)] = [(slot, room), ...]
+    - 삭제 → 해당 시수 해제, 변경 → 여전히 유효한 기존 슬롯은 유지하고 나머지만 재배치,
+      추가 → try_schedule과 같은 순서(GRID 순서, rooms 순서 첫 빈 강의실)로 배치
+    - 다른 과목의 배정은 건드리지 않음
+    - shared: 다른 ScheduleState의 강의실/교수/학과-학년 점유 인덱스를 함께 사용 (배치 모드에서
+      같은 학기의 여러 학과가 같은 강의실을 두고 경쟁할 때). 과목/배정 목록은 각자 따로 가짐
+    """
+    def __init__(self, rooms, GRID, respect_capacity=False, check_instructor=True, check_cohort=True,
+                 slot_minutes=60, shared=None, fallback_rooms=()):
+        self.rooms = list(rooms) if shared is None else shared.rooms
+        self.grid = list(GRID) if shared is None else shared.grid
+        self.slot_minutes = slot_minutes
+        self.check_instructor = check_instructor
+        self.check_cohort = check_cohort
+        if shared is None:
+            self.avail = RoomAvailability(self.rooms, self.grid, respect_capacity=respect_capacity)
+            self.by_instructor = OccupancyIndex()
+            self.by_cohort = OccupancyIndex()
+            # fallback_rooms(외부대여 등): 일반 강의실로 못 채운 시수에만 쓰는 강의실 비트마스크
+            fallback = {str(rid) for rid in fallback_rooms}
+            self.fallback = sum(1 << ri for ri, r in enumerate(self.rooms) if str(r["room_id"]) in fallback)
+        else:
+            self.avail = shared.avail
+            self.by_instructor = shared.by_instructor
+            self.by_cohort = shared.by_cohort
+            self.fallback = shared.fallback
+        self.courses = {}
+        self.placed = {}
+
+    @classmethod
+    def from_schedule(cls, df_sched, rooms, GRID, **opts):
+        """assigned_schedule.csv(DataFrame)로 상태 복원. 목록에 없는 강의실(외부대여 등)은 자동 추가"""
+        if "section" not in df_sched.columns:
+            raise RuntimeError("증분 모드에는 section 열이 있는 assigned_schedule.csv가 필요합니다. 전체 배정을 한 번 다시 실행하세요.")
+        rooms = list(rooms)
+        known = {str(r["room_id"]) for r in rooms}
+        for rid, rtype in df_sched[["room_id", "room_type"]].drop_duplicates("room_id").itertuples(index=False):
+            if str(rid) not in known:
+                rooms.append({"room_id": rid, "room_type": rtype, "capacity": 999999})
+                known.add(str(rid))
+        state = cls(rooms, GRID, **opts)
+        room_idx = {str(r["room_id"]): ri for ri, r in enumerate(state.rooms)}
+        slot_idx = {(sl.day, sl.start): si for si, sl in enumerate(state.grid)}
+
+        df = df_sched.copy()
+        df["cohort"] = df["cohort"].fillna("").astype(str) if "cohort" in df.columns else ""
+        for (cid, sec), g in df.groupby(["course_id", "section"], sort=False):
+            first = g.iloc[0]
+            course = {
+                "course_id": str(cid), "section": int(sec),
+                "name": first["name"], "instructor": str(first["instructor"]),
+                "enrollment": int(first["enrollment"]), "requires_lab": first["requires_lab"],
+                "cohort": first["cohort"], "hours_per_week": int(round(g["hours"].sum())), "priority": 1,
+            }
+            key = course_key(course)
+            state.courses[key] = course
+            state.placed[key] = []
+            for day, start, rid in g[["day", "start", "room_id"]].itertuples(index=False):
+                si = slot_idx.get((day, start))
+                if si is None:
+                    raise RuntimeError(f"GRID에 없는 슬롯: {day} {start} (--start-hour/--end-hour 확인)")
+                state._occupy(key, si, room_idx[str(rid)])
+        return state
+
+    def _occupy(self, key, si, ri):
+        c = self.courses[key]
+        self.avail.occupy(ri, si)
+        self.by_instructor.occupy(c["instructor"], si)
+        self.by_cohort.occupy(c.get("cohort"), si)
+        self.placed[key].append((si, ri))
+
+    def _release_all(self, key):
+        c = self.courses[key]
+        for si, ri in self.placed.pop(key, []):
+            self.avail.release(ri, si)
+            self.by_instructor.release(c["instructor"], si)
+            self.by_cohort.release(c.get("cohort"), si)
+
+    def _can_place(self, course, si, ri=None, taken=0):
+        if (taken >> si) & 1:
+            return False
+        if self.check_instructor and not self.by_instructor.is_free(course["instructor"], si):
+            return False
+        if self.check_cohort and not self.by_cohort.is_free(course.get("cohort"), si):
+            return False
+        eligible = self.avail.eligible_mask(course)
+        if ri is None:
+            return self.avail.first_free_room(si, eligible) >= 0
+        return (eligible >> ri) & 1 == 1 and self.avail.is_free(ri, si)
+
+    def _restore(self, key, keep):
+        """기존 (slot, room) 중 새 조건에서도 유효한 것만 다시 점유"""
+        course = self.courses[key]
+        self.placed[key] = []
+        need = slots_needed(course["hours_per_week"], self.slot_minutes)
+        taken = 0
+        for si, ri in keep:
+            if len(self.placed[key]) >= need:
+                break
+            if self._can_place(course, si, ri, taken):
+                self._occupy(key, si, ri)
+                taken |= 1 << si
+
+    def _fill(self, key, use_fallback=False):
+        """남은 시수를 1시간 단위(30분 블록이면 연속 2블록, 같은 강의실)로 GRID 순서 + rooms 순서
+        첫 빈 강의실에 배치. use_fallback이 아니면 fallback 강의실은 제외. 미배정 블록 수 반환"""
+        course = self.courses[key]
+        need = slots_needed(course["hours_per_week"], self.slot_minutes)
+        per_hour = slots_needed(1, self.slot_minutes)
+        busy = 0
+        for si, _ in self.placed[key]:
+            busy |= 1 << si
+        if self.check_instructor:
+            busy |= self.by_instructor.mask(course["instructor"])
+        if self.check_cohort:
+            busy |= self.by_cohort.mask(course.get("cohort"))
+        eligible = self.avail.eligible_mask(course)
+        if not use_fallback:
+            eligible &= ~self.fallback
+        while len(self.placed[key]) < need:
+            k = min(per_hour, need - len(self.placed[key]))
+            blocked = 0
+            for j in range(k):
+                blocked |= busy >> j
+            run = self.avail.find_run(k, eligible, blocked)
+            if run is None:
+                break
+            si, ri = run
+            for j in range(k):
+                self._occupy(key, si + j, ri)
+                busy |= 1 << (si + j)
+        return need - len(self.placed[key])
+
+    def apply(self, added=(), removed=(), changed=()):
+        """삭제 → 변경(유효한 기존 슬롯 복원) → 변경/추가의 남은 시수 배치 순으로 반영.
+        fallback 강의실은 모든 과목을 일반 강의실로 먼저 배치한 뒤 남은 시수에만 사용.
+        미배정 시수 목록 반환 (search_schedule과 같은 형식)"""
+        for key in removed:
+            self._release_all(key)
+            self.courses.pop(key, None)
+        keeps = {}
+        for course in changed:
+            key = course_key(course)
+            keeps[key] = self.placed.get(key, [])
+            self._release_all(key)
+            self.courses[key] = dict(course)
+        # 변경 과목끼리 서로의 기존 슬롯을 빼앗지 않도록 복원을 먼저 모두 끝낸다
+        for key, keep in keeps.items():
+            self._restore(key, keep)
+        for course in added:
+            key = course_key(course)
+            self.courses[key] = dict(course)
+            self.placed[key] = []
+        unplaced = []
+        pending = [key for key in list(keeps) + [course_key(c) for c in added] if self._fill(key) > 0]
+        for key in pending:
+            missing = self._fill(key, use_fallback=True)
+            if missing > 0:
+                c = self.courses[key]
+                unplaced.append({"course_id": c["course_id"], "name": c["name"], "instructor": c["instructor"],
+                                 "requires_lab": c["requires_lab"], "hours": missing * self.slot_minutes / 60
+                                 if self.slot_minutes != 60 else missing})
+        return unplaced
+
+    def match_sections(self, courses):
+        """분반 열 없이 CSV 순서로 매긴 section을 기존 상태의 분반에 맞춤
+
+        같은 교과목코드 안에서 ① 내용(COURSE_FIELDS)이 모두 같은 분반, ② 교수·학과-학년이 같은 분반,
+        ③ 남은 분반끼리 순서대로 짝지음 (①②는 같은 section 번호를 먼저). 짝이 없는 새 분반은 쓰이지 않는
+        번호를 받는다. (앞 분반 한 줄을 지워도, 같은 교수의 다른 분반이 section 번호가 당겨져
+        '변경'으로 잡히거나 옮겨지지 않게)"""
+        def same(c, key):
+            return all(str(c.get(f, "")) == str(self.courses[key].get(f, "")) for f in COURSE_FIELDS)
+
+        def same_ident(c, key):
+            old = self.courses[key]
+            return (str(c["instructor"]), str(c.get("cohort", ""))) == (str(old["instructor"]), str(old.get("cohort", "")))
+
+        passes = [
+            lambda c, k: k == course_key(c) and same(c, k),
+            same,
+            lambda c, k: k == course_key(c) and same_ident(c, k),
+            same_ident,
+        ]
+        existing = {}
+        for key in self.courses:
+            existing.setdefault(key[0], []).append(key)
+        out = [dict(c) for c in courses]
+        by_code = {}
+        for c in out:
+            by_code.setdefault(str(c["course_id"]), []).append(c)
+        for cid, group in by_code.items():
+            free = list(existing.get(cid, []))
+            matched = {}
+            for ok in passes:
+                for c in group:
+                    if id(c) in matched:
+                        continue
+                    key = next((k for k in free if ok(c, k)), None)
+                    if key is not None:
+                        matched[id(c)] = key
+                        free.remove(key)
+            for c in group:
+                if id(c) not in matched and free:
+                    matched[id(c)] = free.pop(0)
+            used = {k[1] for k in existing.get(cid, [])}
+            for c in group:
+                if id(c) in matched:
+                    c["section"] = matched[id(c)][1]
+                else:
+                    c["section"] = max(used, default=0) + 1
+                    used.add(c["section"])
+        return out
+
+    def diff(self, courses, rematch=True):
+        """새 과목 목록과 현재 상태 비교 → (added, removed_keys, changed)
+        rematch: section이 CSV 순서로 매겨진 경우 먼저 match_sections로 기존 분반에 맞춤"""
+        if rematch:
+            courses = self.match_sections(courses)
+        new = {course_key(c): c for c in courses}
+        added = [c for k, c in new.items() if k not in self.courses]
+        removed = [k for k in self.courses if k not in new]
+        changed = [c for k, c in new.items()
+                   if k in self.courses and any(str(c.get(f, "")) != str(self.courses[k].get(f, "")) for f in COURSE_FIELDS)]
+        return added, removed, changed
+
+    def assignments(self):
+        slot_hours = 1 if self.slot_minutes == 60 else self.slot_minutes / 60
+        return [make_assignment(self.courses[key], self.rooms[ri], self.grid[si], slot_hours)
+                for key, slots in self.placed.items() for si, ri in slots]
+
+def export_outputs(assignments, GRID, rooms, anchor_date, out_dir, chart=True, occupancy=None):
+    """occupancy: 빈 슬롯/가동률 계산에 쓸 배정 목록 (기본 assignments). 배치 모드에서 같은 학기의
+    다른 작업 배정까지 넘기면 공유 강의실 기준으로 계산"""
     os.makedirs(out_dir, exist_ok=True)
     df_sched = pd.DataFrame(assignments).sort_values(["day","start","room_id","name"])
+    df_occ = df_sched if occupancy is None else pd.DataFrame(occupancy)
     assigned_path = os.path.join(out_dir, "assigned_schedule.csv")
     df_sched.to_csv(assigned_path, index=False, encoding="utf-8-sig")
 
-    # Vacancies
+    # Vacancies: (강의실 × GRID) 전체에서 점유된 (room_id, day, start)를 뺀 anti-join
     room_ids = [r["room_id"] for r in rooms]
-    occupied = {(r["room_id"], r["day"], r["start"]) for _, r in df_sched.iterrows()}
-    vac_rows = []
-    for rid in room_ids:
-        for sl in GRID:
-            if (rid, sl.day, sl.start) not in occupied:
-                vac_rows.append({"room_id": rid, "day": sl.day, "start": sl.start, "end": sl.end})
+    df_grid = pd.DataFrame(GRID, columns=["day", "start", "end"])
+    df_all = pd.DataFrame({"room_id": pd.Series(room_ids, dtype=object)}).merge(df_grid, how="cross")
+    occupied = df_occ[["room_id", "day", "start"]].drop_duplicates().astype({"room_id": object})
+    df_vac = df_all.merge(occupied, on=["room_id", "day", "start"], how="left", indicator=True)
+    df_vac = df_vac.loc[df_vac["_merge"] == "left_only", ["room_id", "day", "start", "end"]]
     vacant_path = os.path.join(out_dir, "vacant_slots.csv")
-    pd.DataFrame(vac_rows).to_csv(vacant_path, index=False, encoding="utf-8-sig")
-
-    # Calendar CSV
-    dmap = {"Mon":0,"Tue":1,"Wed":2,"Thu":3,"Fri":4}
-    cal = []
-    for _, r in df_sched.iterrows():
-        delta = timedelta(days=dmap[r["day"]])
-        sdt = datetime.strptime(r["start"], "%H:%M")
-        edt = datetime.strptime(r["end"], "%H:%M")
-        start_dt = anchor_date.replace(hour=sdt.hour, minute=sdt.minute) + delta
-        end_dt = anchor_date.replace(hour=edt.hour, minute=edt.minute) + delta
-        cal.append({
-            "Subject": f'{r["name"]} ({r["course_id"]})',
-            "Start Date": start_dt.strftime("%Y-%m-%d"),
-            "Start Time": start_dt.strftime("%H:%M"),
-            "End Date": end_dt.strftime("%Y-%m-%d"),
-            "End Time": end_dt.strftime("%H:%M"),
-            "All Day Event": "False",
-            "Description": f'Instructor: {r["instructor"]}; Enrollment: {r["enrollment"]}; Lab: {r["requires_lab"]}',
-            "Location": f'{r["room_id"]} ({r["room_type"]})'
-        })
+    df_vac.to_csv(vacant_path, index=False, encoding="utf-8-sig")
+
+    # Calendar CSV: 요일 → 날짜 표를 한 번 만들고 열 단위 문자열 연산
+    day_date = {d: (anchor_date + timedelta(days=i)).strftime("%Y-%m-%d") for i, d in enumerate(DAYS)}
+    dates = df_sched["day"].map(day_date)
+    cal = pd.DataFrame({
+        "Subject": df_sched["name"].astype(str) + " (" + df_sched["course_id"].astype(str) + ")",
+        "Start Date": dates,
+        "Start Time": df_sched["start"],
+        "End Date": dates,
+        "End Time": df_sched["end"],
+        "All Day Event": "False",
+        "Description": "Instructor: " + df_sched["instructor"].astype(str)
+                       + "; Enrollment: " + df_sched["enrollment"].astype(str)
+                       + "; Lab: " + df_sched["requires_lab"].astype(str),
+        "Location": df_sched["room_id"].astype(str) + " (" + df_sched["room_type"].astype(str) + ")",
+    })
     cal_path = os.path.join(out_dir, "calendar_google_import.csv")
-    pd.DataFrame(cal).to_csv(cal_path, index=False, encoding="utf-8-sig")
+    cal.to_csv(cal_path, index=False, encoding="utf-8-sig")
 
     # Utilization chart
     total_blocks = len(GRID)
-    usage = df_sched.groupby("room_id").size().reindex(room_ids, fill_value=0)
+    usage = df_occ.groupby("room_id").size().reindex(room_ids, fill_value=0)
     util_df = pd.DataFrame({"room_id": room_ids, "used_blocks": usage.values})
     util_df["total_blocks"] = total_blocks
     util_df["utilization_rate"] = util_df["used_blocks"] / util_df["total_blocks"]
+    if not chart:
+        return assigned_path, vacant_path, cal_path, None
 
     plt.figure(figsize=(8,5))
-    plt.bar(util_df["room_id"], util_df["utilization_rate"])
+    plt.bar(util_df["room_id"].astype(str), util_df["utilization_rate"])
     plt.title("Room Utilization Rate (1-hour blocks, Mon-Fri)")
     plt.xlabel("Room")
     plt.ylabel("Utilization")
@@ -223,11 +1020,23 @@ def main():
     parser.add_argument("--start-hour", type=int, default=9, help="하루 시작 시간 (기본 9)")
     parser.add_argument("--end-hour", type=int, default=21, help="하루 종료 시간 (기본 21; 자신은 포함 안 됨)")
     parser.add_argument("--respect-capacity", action="store_true", help="rooms.csv capacity를 수강인원과 비교하여 초과 시 배정 금지")
+    parser.add_argument("--allow-instructor-overlap", action="store_true", help="같은 교수의 동시간대 중복 배정 허용 (기본: 금지)")
+    parser.add_argument("--allow-cohort-overlap", action="store_true", help="같은 학과-학년(개설학년)의 동시간대 중복 배정 허용 (기본: 금지)")
+    parser.add_argument("--solver", choices=["greedy", "search"], default="greedy", help="greedy: 기존 순차 배정 / search: 제약 전파 + 백트래킹 탐색")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="--solver search 시도당 탐색 시간 제한(초, 기본 10)")
+    parser.add_argument("--slot-minutes", type=int, choices=[60, 30], default=60, help="시간 블록 단위(분, 기본 60)")
+    parser.add_argument("--block-mode", choices=["hourly", "split", "single"], default="hourly", help="greedy 배치 단위: hourly(1시간씩) / split(2+1) / single(연속 한 번)")
+    parser.add_argument("--restarts", type=int, default=1, help="greedy 순서를 바꿔 여러 번 시도 후 score 최솟값 선택 (기본 1)")
+    parser.add_argument("--workers", type=int, default=1, help="--restarts 병렬 프로세스 수 (기본 1)")
+    parser.add_argument("--seed", type=int, default=0, help="--restarts 순서 섞기 seed (같은 seed → 같은 결과)")
+    parser.add_argument("--incremental", action="store_true", help="기존 assigned_schedule.csv를 유지하고 변경된 과목만 재배치")
+    parser.add_argument("--base-schedule", default=None, help="--incremental 기준 배정표 (기본: <out-dir>/assigned_schedule.csv)")
     parser.add_argument("--out-dir", default=".", help="산출물 저장 폴더 (기본: 현재 폴더)")
     args = parser.parse_args()
+    if args.solver == "search" and args.slot_minutes != 60 and not args.incremental:
+        parser.error("--solver search는 --slot-minutes 60에서만 사용할 수 있습니다 (30분 블록은 greedy/--incremental)")
 
     # Load data
-    df_courses_raw = read_csv_auto(args.courses)
     df_rooms = ensure_rooms_csv(args.rooms)
     if not args.respect_capacity:
         # 무시 모드: 큰 수로 통일
@@ -235,26 +1044,61 @@ def main():
         df_rooms["capacity"] = 999999
 
     # Transform courses
-    df_courses = build_courses_frame(df_courses_raw, department_filter=args.department_filter)
+    df_courses = load_courses(args.courses, department_filter=args.department_filter)
 
     # Dicts
     rooms = df_rooms.to_dict(orient="records")
     courses = df_courses.to_dict(orient="records")
 
-    # First attempt
-    assigns, GRID = try_schedule(rooms, courses, args.start_hour, args.end_hour, respect_capacity=args.respect_capacity)
-
-    # Borrowed room once if needed
+    check = dict(respect_capacity=args.respect_capacity,
+                 check_instructor=not args.allow_instructor_overlap,
+                 check_cohort=not args.allow_cohort_overlap,
+                 slot_minutes=args.slot_minutes)
+    borrowed = BORROWED_ROOM
     used_borrowed = False
-    if assigns is None:
-        borrowed = {"room_id":"외부대여-타강의실1","room_type":"lecture","capacity":999999}
-        rooms2 = rooms + [borrowed]
-        assigns, GRID = try_schedule(rooms2, courses, args.start_hour, args.end_hour, respect_capacity=args.respect_capacity)
-        used_borrowed = assigns is not None
+    unplaced = []
 
-    if assigns is None:
-        print("[ERROR] 배정 실패: 시간 블록/요일을 늘리거나(예: --end-hour 22), 토요일 도입(코드 확장) 또는 과목 범위 축소 필요")
-        sys.exit(1)
+    if args.incremental:
+        # 증분 모드: 기존 배정을 상태로 읽고 courses CSV와 달라진 과목만 재배치
+        base_path = args.base_schedule or os.path.join(args.out_dir, "assigned_schedule.csv")
+        GRID = build_grid(args.start_hour, args.end_hour, args.slot_minutes)
+        state = ScheduleState.from_schedule(read_csv_auto(base_path), rooms, GRID, **check)
+        added, removed, changed = state.diff(courses, rematch=not df_courses.attrs.get("explicit_section"))
+        unplaced = state.apply(added=added, removed=removed, changed=changed)
+        assigns = state.assignments()
+        used_borrowed = any(str(r["room_id"]) == borrowed["room_id"] for r in state.rooms)
+        rooms = [r for r in state.rooms if str(r["room_id"]) != borrowed["room_id"]]
+        print(f"[INFO] 증분 반영: 추가 {len(added)} / 삭제 {len(removed)} / 변경 {len(changed)} 과목")
+    elif args.solver == "search":
+        # 탐색 모드: 대여 없이 먼저 풀고, 미배정이 남을 때만 대여 강의실로 재탐색
+        assigns, GRID, unplaced = search_schedule(rooms, courses, args.start_hour, args.end_hour,
+                                                  time_limit=args.time_limit, **check)
+        if unplaced:
+            assigns2, GRID, unplaced2 = search_schedule(rooms + [borrowed], courses, args.start_hour, args.end_hour,
+                                                        time_limit=args.time_limit, **check)
+            if sum(u["hours"] for u in unplaced2) < sum(u["hours"] for u in unplaced):
+                assigns, unplaced, used_borrowed = assigns2, unplaced2, True
+    elif args.restarts > 1:
+        assigns, GRID, used_borrowed, _ = multi_start_schedule(
+            rooms, courses, args.start_hour, args.end_hour, borrowed,
+            restarts=args.restarts, workers=args.workers, seed=args.seed, block_mode=args.block_mode, **check)
+        if assigns is None:
+            print("[ERROR] 배정 실패: 모든 시도에서 배정하지 못했습니다. --end-hour 확장 또는 --solver search 참고")
+            sys.exit(1)
+    else:
+        # First attempt
+        assigns, GRID = try_schedule(rooms, courses, args.start_hour, args.end_hour, block_mode=args.block_mode, **check)
+
+        # Borrowed room once if needed
+        if assigns is None:
+            rooms2 = rooms + [borrowed]
+            assigns, GRID = try_schedule(rooms2, courses, args.start_hour, args.end_hour, block_mode=args.block_mode, **check)
+            used_borrowed = assigns is not None
+
+        if assigns is None:
+            print("[ERROR] 배정 실패: 시간 블록/요일을 늘리거나(예: --end-hour 22), 토요일 도입(코드 확장) 또는 과목 범위 축소 필요")
+            print("        (교수/학과-학년 중복 금지 때문이라면 --allow-instructor-overlap / --allow-cohort-overlap, 또는 --solver search 참고)")
+            sys.exit(1)
 
     # Export
     try:
@@ -263,7 +1107,12 @@ def main():
         print("[WARN] anchor-date 파싱 실패. 2025-11-03으로 대체")
         anchor = datetime(2025, 11, 3)
 
-    assigned_path, vacant_path, cal_path, util_path = export_outputs(assigns, GRID, rooms + ([{"room_id":"외부대여-타강의실1","room_type":"lecture","capacity":999999}] if used_borrowed else []), anchor, args.out_dir)
+    assigned_path, vacant_path, cal_path, util_path = export_outputs(assigns, GRID, rooms + ([borrowed] if used_borrowed else []), anchor, args.out_dir)
+
+    unplaced_path = None
+    if unplaced:
+        unplaced_path = os.path.join(args.out_dir, "unplaced_hours.csv")
+        pd.DataFrame(unplaced).to_csv(unplaced_path, index=False, encoding="utf-8-sig")
 
     # Console summary
     print("[DONE] 산출물 생성 완료 ↓↓↓")
@@ -272,6 +1121,8 @@ def main():
     print(" - calendar_google_import.csv:", cal_path)
     print(" - utilization.png      :", util_path)
     print(" - borrowed extra room? :", "YES" if used_borrowed else "NO")
+    if unplaced_path:
+        print(f"[WARN] 미배정 {sum(u['hours'] for u in unplaced)}시간 ({len(unplaced)}과목):", unplaced_path)
 
 if __name__ == "__main__":
     main()
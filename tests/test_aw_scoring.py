@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""fastapi_aw_demo/scoring.py: 벡터화 점수(score_clv/score_churn)가 고객별 함수(_clv_naive/_churn)와 같은 값인지
+
+합성 피처 테이블(반올림 경계 값)은 항상 검사. 실제 데이터 피처는 app1을 import해야 하고 app1은 import
+시점에 엑셀을 읽으므로, AdventureWorks Sales.xlsx가 없으면 그 경우만 건너뜀
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+DEMO = Path(__file__).resolve().parent.parent / "fastapi_aw_demo"
+sys.path.insert(0, str(DEMO))
+import scoring  # noqa: E402
+
+WORKBOOKS = (DEMO / "data" / "AdventureWorks Sales.xlsx", DEMO / "AdventureWorks Sales.xlsx")
+
+
+def _tie_features(n=2000, seed=0):
+    """반올림 경계(.xx5, .xxx5)와 그 바로 옆 값이 많이 섞인 합성 피처 테이블"""
+    rng = np.random.default_rng(seed)
+    cents = rng.integers(0, 10**7, n) / 100
+    sales_sum = cents + 0.005
+    sales_sum[::3] = np.nextafter(sales_sum[::3], np.inf)
+    sales_sum[1::3] = np.nextafter(sales_sum[1::3], -np.inf)
+    sales_mean = rng.integers(0, 10**5, n) / 100 + 0.005
+    sales_mean[::7] = 0.0
+    sales_sum[:6] = [0.125, 2.675, 1.005, 0.285, 1e16 + 2.0, 2.5e15 + 0.5]
+    # churn 점수 = days/300 + 0.4 - 0.04 * orders (180일 미만) → days = 0.3m + 0.15 이면 점수가 .xxx5
+    days_since = np.concatenate([rng.integers(0, 400, n // 2), (3 * rng.integers(0, 600, n - n // 2) + 1.5) / 10])
+    order_count = rng.integers(0, 15, n)
+    return pd.DataFrame({
+        "sales_sum": sales_sum,
+        "sales_mean": sales_mean,
+        "order_count": order_count,
+        "days_since": days_since,
+    }, index=pd.Index(np.arange(1, n + 1), name="CustomerKey"))
+
+
+@pytest.fixture(params=["data", "ties"])
+def feat(request):
+    if request.param == "ties":
+        return _tie_features()
+    if not any(p.exists() for p in WORKBOOKS):
+        pytest.skip("AdventureWorks Sales.xlsx 없음")
+    import app1
+    return app1.FEATURES
+
+
+def test_score_clv_matches_clv_naive(feat):
+    scored = scoring.score_clv(feat)
+    stats = {"aov": 0.0}
+    for cid, row in zip(feat.index, scored.itertuples(index=False)):
+        got = (row.hist, row.aov, int(row.expected_orders), row.clv)
+        assert repr(got) == repr(scoring._clv_naive(feat, stats, cid)), cid
+
+
+def test_score_churn_matches_churn(feat):
+    scored = scoring.score_churn(feat)
+    for cid, row in zip(feat.index, scored.itertuples(index=False)):
+        assert repr((row.churn_score, row.churn_risk)) == repr(scoring._churn(feat, cid)), cid
+
+
+def test_round_list_matches_round_near_ties():
+    values = _tie_features(5000, seed=1)["sales_sum"].tolist() + [-0.125, -2.675, 0.0005, 1e300, -0.0]
+    for ndigits in (2, 3):
+        assert scoring._round_list(values, ndigits) == [round(v, ndigits) for v in values]
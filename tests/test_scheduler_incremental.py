@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""main_scheduler.py: 증분 모드(ScheduleState.diff/apply)가 손대지 않은 분반을 옮기지 않는지"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from main_scheduler import ScheduleState, build_courses_frame, build_grid  # noqa: E402
+
+ROOMS = [
+    {"room_id": "1215", "room_type": "lecture", "capacity": 9999},
+    {"room_id": "1217", "room_type": "lab", "capacity": 9999},
+    {"room_id": "1418", "room_type": "lab", "capacity": 9999},
+]
+COLUMNS = ["교과목코드", "교과목명", "강좌담당교수", "수강인원", "교과목학점", "강의유형구분", "개설학과", "개설학년"]
+ROWS = [
+    # 같은 교과목코드, 같은 교수·학과-학년의 두 분반 (수강인원만 다름)
+    ["G531", "M프로그래밍언어활용(1)", "배희호", 41, 3, "실습", "소프트웨어융합과", 1],
+    ["G531", "M프로그래밍언어활용(1)", "배희호", 30, 3, "실습", "소프트웨어융합과", 1],
+    ["M438", "M애플리케이션배포", "유소율", 38, 3, "실습", "소프트웨어융합과", 2],
+    ["M438", "M애플리케이션배포", "박상렬", 23, 3, "실습", "소프트웨어융합과", 2],
+    ["H153", "IoT시스템개발", "정환익", 12, 3, "이론", "소프트웨어융합학과", 4],
+]
+
+
+def _courses(rows):
+    return build_courses_frame(pd.DataFrame(rows, columns=COLUMNS)).to_dict(orient="records")
+
+
+def _base_state(grid):
+    """전체 배정 → assigned_schedule.csv와 같은 표 → 증분 모드 상태"""
+    first = ScheduleState(ROOMS, grid)
+    assert first.apply(added=_courses(ROWS)) == []
+    return ScheduleState.from_schedule(pd.DataFrame(first.assignments()), ROOMS, grid)
+
+
+def _slots(state, course_id, enrollment):
+    return sorted((a["day"], a["start"], a["room_id"]) for a in state.assignments()
+                  if a["course_id"] == course_id and a["enrollment"] == enrollment)
+
+
+def test_deleting_first_of_same_teacher_sections_keeps_the_other():
+    grid = build_grid(9, 21)
+    state = _base_state(grid)
+    before = _slots(state, "G531", 30)
+    added, removed, changed = state.diff(_courses(ROWS[1:]))
+    assert (added, changed) == ([], [])
+    assert removed == [("G531", 1)]
+    assert state.apply(added=added, removed=removed, changed=changed) == []
+    assert _slots(state, "G531", 30) == before
+    assert _slots(state, "G531", 41) == []
+
+
+def test_deleting_first_section_of_other_teacher_keeps_the_other():
+    grid = build_grid(9, 21)
+    state = _base_state(grid)
+    before = _slots(state, "M438", 23)
+    added, removed, changed = state.diff(_courses(ROWS[:2] + ROWS[3:]))
+    assert (added, changed, removed) == ([], [], [("M438", 1)])
+    state.apply(added=added, removed=removed, changed=changed)
+    assert _slots(state, "M438", 23) == before
+
+
+def test_changed_section_keeps_its_key_and_valid_slots():
+    grid = build_grid(9, 21)
+    state = _base_state(grid)
+    before = _slots(state, "G531", 41)
+    rows = [list(r) for r in ROWS]
+    rows[0][3] = 45  # 수강인원만 변경
+    added, removed, changed = state.diff(_courses(rows))
+    assert (added, removed) == ([], [])
+    assert [(c["course_id"], c["section"], c["enrollment"]) for c in changed] == [("G531", 1, 45)]
+    state.apply(added=added, removed=removed, changed=changed)
+    assert _slots(state, "G531", 45) == before
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""app.py: SearchIndex(n-gram 역색인)가 search_dict와 같은 결과/순서를 내는지 무작위 비교
+(레코드 추가/수정/삭제 후에도)"""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app import SearchIndex, search_dict  # noqa: E402
+
+WORDS = ["무선", "이어폰", "기계식", "키보드", "게이밍", "마우스", "서울", "경기", "남양주시",
+         "ANC", "RGB", "Pro", "mini", "010-1234", "청축", "매크로", "지원", " ", "a", "Aa"]
+
+
+def _record(rng, key):
+    return {
+        "id": key,
+        "name": " ".join(rng.sample(WORDS, rng.randint(1, 3))),
+        "price": rng.choice([0, 59000, 89000, 129000, None, 1.5]),
+        "desc": "".join(rng.choice(WORDS) for _ in range(rng.randint(0, 4))),
+    }
+
+
+def _queries(rng, data):
+    texts = [str(v) for item in data.values() for v in item.values()]
+    out = ["", " ", "  ", None, "없는말", "zz"]
+    for _ in range(40):
+        if texts and rng.random() < 0.7:
+            t = rng.choice(texts)
+            i = rng.randrange(len(t) + 1)
+            q = t[i:i + rng.randint(1, 4)]
+        else:
+            q = "".join(rng.choice("무선이어폰키보드ancrgb 0-") for _ in range(rng.randint(1, 3)))
+        out.append(q.upper() if rng.random() < 0.2 else q)
+    return out
+
+
+def _check(index, data, rng):
+    for q in _queries(rng, data):
+        assert index.search(q) == search_dict(data, q), q
+        seqs = [pos for pos, _ in index.matches(q)]
+        assert seqs == sorted(seqs)
+        if seqs:
+            after = rng.choice(seqs)
+            assert [pos for pos, _ in index.matches(q, after=after)] == [p for p in seqs if p > after]
+
+
+def test_search_index_matches_search_dict_randomized():
+    rng = random.Random(0)
+    for _ in range(20):
+        data = {k: _record(rng, k) for k in rng.sample(range(1, 200), rng.randint(0, 40))}
+        index = SearchIndex(data)
+        _check(index, data, rng)
+        for _ in range(60):
+            op = rng.random()
+            if op < 0.35 or not data:
+                key = rng.randint(1, 300)  # 새 키 또는 기존 키 덮어쓰기
+                data[key] = _record(rng, key)
+                index.upsert(key, data[key])
+            elif op < 0.65:
+                key = rng.choice(list(data))
+                data[key]["desc"] = rng.choice(WORDS) + data[key]["desc"]  # 제자리 수정
+                index.upsert(key, data[key])
+            else:
+                key = rng.choice(list(data))
+                del data[key]
+                index.remove(key)
+            if rng.random() < 0.2:
+                _check(index, data, rng)
+        _check(index, data, rng)
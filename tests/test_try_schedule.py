@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""main_scheduler.py: 비트마스크 try_schedule이 예전 dict 기반 greedy와 같은 배정을 내는지 무작위 비교
+(교수/학과-학년 검사를 끈 상태 = 예전 greedy와 같은 규칙, 수용인원 검사 on/off 모두)"""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from main_scheduler import try_schedule  # noqa: E402
+
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+BASE_FIELDS = ["course_id", "name", "instructor", "enrollment", "requires_lab",
+               "room_id", "room_type", "day", "start", "end", "hours"]
+
+
+def reference_schedule(rooms, courses, start_hour, end_hour, respect_capacity):
+    """예전 try_schedule: (강의실, 요일, 시각) dict를 요일 → 시각 → rooms 순서로 훑어 첫 빈 강의실에 1시간씩"""
+    hours = [(f"{h:02d}:00", f"{h + 1:02d}:00") for h in range(start_hour, end_hour)]
+    avail = {(r["room_id"], d, s): True for r in rooms for d in DAYS for s, _ in hours}
+    assigns = []
+
+    def room_ok(room, course):
+        if course["requires_lab"] == "Y" and str(room["room_type"]).lower() != "lab":
+            return False
+        if respect_capacity:
+            try:
+                if int(room.get("capacity", 9999)) < int(course.get("enrollment", 0)):
+                    return False
+            except Exception:
+                pass
+        return True
+
+    order = sorted(courses, key=lambda c: (c["priority"], -c["hours_per_week"], -(1 if c["requires_lab"] == "Y" else 0)))
+    for c in order:
+        need, got = int(c["hours_per_week"]), 0
+        for d in DAYS:
+            for s, e in hours:
+                if got >= need:
+                    break
+                for r in rooms:
+                    if room_ok(r, c) and avail[(r["room_id"], d, s)]:
+                        avail[(r["room_id"], d, s)] = False
+                        assigns.append({"course_id": c["course_id"], "name": c["name"], "instructor": c["instructor"],
+                                        "enrollment": c["enrollment"], "requires_lab": c["requires_lab"],
+                                        "room_id": r["room_id"], "room_type": r["room_type"],
+                                        "day": d, "start": s, "end": e, "hours": 1})
+                        got += 1
+                        break
+        if got < need:
+            return None
+    return assigns
+
+
+def _case(rng):
+    rooms = [{"room_id": f"R{i}", "room_type": rng.choice(["lab", "lecture", "Lab"]),
+              "capacity": rng.choice([20, 40, 80, "x"])} for i in range(rng.randint(1, 12))]
+    courses = [{"course_id": f"C{i}", "name": f"n{i}", "instructor": f"P{rng.randrange(6)}",
+                "enrollment": rng.randint(5, 100), "requires_lab": rng.choice("YN"),
+                "hours_per_week": rng.choice([0, 1, 2, 3, 3, 4]), "priority": rng.choice([1, 1, 2]),
+                "cohort": f"D-{rng.randrange(3)}"} for i in range(rng.randint(0, 60))]
+    start = rng.randint(8, 10)
+    return rooms, courses, start, start + rng.randint(1, 10)
+
+
+def test_try_schedule_matches_reference_greedy():
+    rng = random.Random(0)
+    placed = failed = 0
+    for _ in range(300):
+        rooms, courses, start, end = _case(rng)
+        for cap in (False, True):
+            expected = reference_schedule(rooms, courses, start, end, cap)
+            got, _ = try_schedule(rooms, courses, start, end, cap, check_instructor=False, check_cohort=False)
+            if expected is None:
+                assert got is None
+                failed += 1
+            else:
+                assert got is not None
+                assert [{k: a[k] for k in BASE_FIELDS} for a in got] == expected
+                placed += 1
+    # 두 경우(완성/실패)가 모두 충분히 나오는지
+    assert placed > 50 and failed > 50